@@ -17,10 +17,18 @@ Usage examples:
 
 import os
 import sys
-import glob
+import re
 import argparse
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Matplotlib imports - for static image output
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.lines import Line2D
 
 # Bokeh imports
 from bokeh.plotting import figure, save, show
@@ -36,8 +44,58 @@ from bokeh.io import output_file as bokeh_output_file
 import holoviews as hv
 from holoviews.operation.datashader import rasterize
 import datashader as ds
+import datashader.transfer_functions as tf
 hv.extension('bokeh')
 
+# Combination directory, light curve file name and full relative path, e.g.
+# src015_bkg050-080_bin0.1/final_LC_src15_bkg50-80.txt
+_COMBO_DIR_RE = re.compile(r'^src(\d+)_bkg(\d+-\d+)_bin([\d.]+)$')
+_LC_FILE_RE = re.compile(r'^final_LC_src\d+_bkg\d+-\d+\.txt$')
+_LC_PATH_RE = re.compile(
+    r'(?P<obsid>[^/\\]+)[/\\]src(?P<src>\d+)_bkg(?P<bkg>\d+-\d+)_bin(?P<bin>[\d.]+)[/\\]'
+    r'final_LC_src(?P<src_file>\d+)_bkg(?P<bkg_file>\d+-\d+)\.txt$'
+)
+
+# Total number of points above which the Bokeh plot is always rasterized
+DATASHADER_MIN_POINTS = 50_000
+
+# Curves longer than this are bin-averaged to at most the target size before
+# being drawn as individual Bokeh glyphs
+BOKEH_DECIMATE_MIN_POINTS = 20_000
+BOKEH_DECIMATE_TARGET_POINTS = 10_000
+
+def _file_stats(rate, error):
+    """Return (mean, std, min, max, mean error) of a light curve (all NaN if empty)."""
+    if rate.size == 0:
+        return np.nan, np.nan, np.nan, np.nan, np.nan
+    return np.mean(rate), np.std(rate), np.min(rate), np.max(rate), np.mean(error)
+
+try:
+    from numba import njit
+except ImportError:
+    pass
+else:
+    @njit(cache=True, nogil=True)
+    def _file_stats(rate, error):
+        """Return (mean, std, min, max, mean error) of a light curve in one pass (all NaN if empty)."""
+        n = rate.shape[0]
+        if n == 0:
+            return np.nan, np.nan, np.nan, np.nan, np.nan
+        s = 0.0
+        ss = 0.0
+        es = 0.0
+        mn = np.inf
+        mx = -np.inf
+        for i in range(n):
+            r = rate[i]
+            s += r
+            ss += r * r
+            mn = min(mn, r)
+            mx = max(mx, r)
+            es += error[i]
+        mean = s / n
+        return mean, np.sqrt(max(ss / n - mean * mean, 0.0)), mn, mx, es / n
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Compare NuSTAR light curves across different parameters.')
@@ -52,16 +110,52 @@ def parse_arguments():
     
     parser.add_argument('--lightcurves_dir', default='/media/kartikmandar/HDD/Cygnusx1_lightcurves/lightcurves_txt',
                         help='Base directory containing light curves text files')
-    parser.add_argument('--output', help='Output file for the plot (HTML format)')
+    parser.add_argument('--output', help='Output file for the plot (.html for interactive Bokeh, otherwise a matplotlib image)')
     parser.add_argument('--title', help='Custom title for the plot')
     
     # Optional arguments for additional analysis
     parser.add_argument('--stats', action='store_true', help='Include detailed statistics in the output')
+    parser.add_argument('--stats_only', action='store_true', help='Print the statistics without loading full curves or plotting')
     parser.add_argument('--normalize', action='store_true', help='Normalize light curves to their means for easier comparison')
-    parser.add_argument('--use_datashader', action='store_true', help='Use datashader for rendering (recommended for large datasets)')
+    parser.add_argument('--use_datashader', action='store_true', help='Use datashader for rendering (always used above 50k points)')
     
     return parser.parse_args()
 
+def _build_file_index(base_dir, obsids=None):
+    """
+    Index the final light curve text files under base_dir using os.scandir.
+
+    Returns a list of (obsid, src, bkg, bin, path) tuples parsed once from
+    the directory names. If obsids is given, only those observations are
+    scanned; otherwise every observation directory is.
+    """
+    index = []
+    if obsids is None:
+        try:
+            with os.scandir(base_dir) as it:
+                obsids = [entry.name for entry in it if entry.is_dir()]
+        except FileNotFoundError:
+            return index
+    
+    for obsid in obsids:
+        try:
+            with os.scandir(os.path.join(base_dir, obsid)) as it:
+                combo_dirs = [entry for entry in it if entry.is_dir()]
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        
+        for combo_dir in combo_dirs:
+            m = _COMBO_DIR_RE.match(combo_dir.name)
+            if not m:
+                continue
+            src, bkg, bin_size = int(m.group(1)), m.group(2), m.group(3)
+            with os.scandir(combo_dir.path) as it:
+                for entry in it:
+                    if _LC_FILE_RE.match(entry.name):
+                        index.append((obsid, src, bkg, bin_size, entry.path))
+    
+    return index
+
 def find_lightcurve_files(args):
     """Find light curve text files based on the comparison type and parameters."""
     base_dir = args.lightcurves_dir
@@ -74,14 +168,8 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for all source radii for this observation/bin/background
-        # Adjust pattern to handle the different filename format for bkg in folders vs filenames
-        pattern = os.path.join(base_dir, args.obs, f"src*_bkg{args.bkg}_bin{args.bin}", "final_LC_src*_bkg*.txt")
-        files = glob.glob(pattern)
-        
-        # Filter to keep only files matching the correct background
-        # In filenames, "050-080" becomes "50-80", so we need to handle this conversion
-        bkg_adjusted = f"{int(args.bkg.split('-')[0])}-{int(args.bkg.split('-')[1])}"
-        files = [f for f in files if f"bkg{bkg_adjusted}" in os.path.basename(f)]
+        files = [path for _, _, bkg, bin_size, path in _build_file_index(base_dir, [args.obs])
+                 if bkg == args.bkg and bin_size == args.bin]
         
     elif args.compare == 'background':
         # Find light curves with different background regions
@@ -90,8 +178,8 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for all background regions for this observation/source/bin
-        pattern = os.path.join(base_dir, args.obs, f"src{int(args.src):03d}_bkg*_bin{args.bin}", f"final_LC_src{args.src}_bkg*.txt")
-        files = glob.glob(pattern)
+        files = [path for _, src, _, bin_size, path in _build_file_index(base_dir, [args.obs])
+                 if src == int(args.src) and bin_size == args.bin]
         
     elif args.compare == 'binning':
         # Find light curves with different time binnings
@@ -100,13 +188,8 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for all bin sizes for this observation/source/background
-        pattern = os.path.join(base_dir, args.obs, f"src{int(args.src):03d}_bkg{args.bkg}_bin*", "final_LC_src*.txt")
-        
-        # Filter to keep only files matching the correct source/background
-        bkg_adjusted = f"{int(args.bkg.split('-')[0])}-{int(args.bkg.split('-')[1])}"
-        src_adjusted = args.src
-        files = glob.glob(pattern)
-        files = [f for f in files if f"src{src_adjusted}_bkg{bkg_adjusted}" in os.path.basename(f)]
+        files = [path for _, src, bkg, _, path in _build_file_index(base_dir, [args.obs])
+                 if src == int(args.src) and bkg == args.bkg]
         
     elif args.compare == 'observations':
         # Find light curves from different observations
@@ -115,13 +198,8 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for this src/bkg/bin across all observations
-        pattern = os.path.join(base_dir, "*", f"src{int(args.src):03d}_bkg{args.bkg}_bin{args.bin}", "final_LC_src*.txt")
-        
-        # Filter to keep only files matching the correct source/background
-        bkg_adjusted = f"{int(args.bkg.split('-')[0])}-{int(args.bkg.split('-')[1])}"
-        src_adjusted = args.src
-        files = glob.glob(pattern)
-        files = [f for f in files if f"src{src_adjusted}_bkg{bkg_adjusted}" in os.path.basename(f)]
+        files = [path for _, src, bkg, bin_size, path in _build_file_index(base_dir)
+                 if src == int(args.src) and bkg == args.bkg and bin_size == args.bin]
     
     if not files:
         print(f"No matching light curve files found using pattern.")
@@ -131,75 +209,173 @@ def find_lightcurve_files(args):
         
     return sorted(files)
 
-def extract_comparison_value(filepath, compare_type):
-    """Extract the value being compared from the filepath."""
-    basename = os.path.basename(filepath)
-    dirname = os.path.basename(os.path.dirname(filepath))
-    obsid = os.path.basename(os.path.dirname(os.path.dirname(filepath)))
-    
+def extract_comparison_value(lc_data, compare_type):
+    """Return the value being compared from a loaded light curve."""
     if compare_type == 'source_radius':
-        # Extract source radius from the filename (e.g., final_LC_src15_bkg50-80.txt)
-        return int(basename.split('_src')[1].split('_')[0])
+        # Source radius from the filename (e.g., final_LC_src15_bkg50-80.txt)
+        return lc_data['src_radius']
         
     elif compare_type == 'background':
-        # Extract background region from the filename
-        return basename.split('_bkg')[1].split('.')[0]
+        # Background region from the filename
+        return lc_data['bkg_region']
         
     elif compare_type == 'binning':
-        # Extract bin size from the directory name
-        return float(dirname.split('_bin')[1])
+        # Bin size from the directory name
+        return lc_data['bin_size']
         
     elif compare_type == 'observations':
         # Return the observation ID
-        return obsid
+        return lc_data['obsid']
         
     return None
 
+def build_plot_title(args):
+    """Build the plot title from the fixed (non-compared) parameters."""
+    if args.title:
+        return args.title
+    
+    # Construct title based on fixed parameters
+    title_parts = []
+    
+    if args.obs and args.compare != 'observations':
+        title_parts.append(f"ObsID: {args.obs}")
+    
+    if args.src and args.compare != 'source_radius':
+        title_parts.append(f"Source: {args.src} arcsec")
+        
+    if args.bkg and args.compare != 'background':
+        title_parts.append(f"Background: {args.bkg}")
+        
+    if args.bin and args.compare != 'binning':
+        title_parts.append(f"Bin: {args.bin} s")
+        
+    comparison_name = {
+        'source_radius': 'Source Radius',
+        'background': 'Background Region',
+        'binning': 'Time Binning',
+        'observations': 'Observations'
+    }
+    
+    return f"Comparison of {comparison_name[args.compare]}\n{', '.join(title_parts)}"
+
+def format_comparison_label(comparison_value, args):
+    """Format the compared value for use as a legend label."""
+    if args.compare == 'source_radius':
+        return f"{comparison_value} arcsec"
+    elif args.compare == 'background':
+        return f"bkg {comparison_value}"
+    elif args.compare == 'binning':
+        if comparison_value < 1:
+            return f"{comparison_value*1000:.0f} ms"
+        return f"{comparison_value:.2f} s"
+    elif args.compare == 'observations':
+        return f"ObsID {comparison_value}"
+    return str(comparison_value)
+
+def has_fresh_cache(lc_file):
+    """Return True if '<lc_file>.npy' exists and is not older than the text file."""
+    try:
+        return os.path.getmtime(lc_file + '.npy') >= os.path.getmtime(lc_file)
+    except OSError:
+        return False
+
+def read_lightcurve_array(lc_file):
+    """
+    Return the (N, 4) float64 array stored in a light curve text file.
+
+    The parsed array is cached next to the text file as '<lc_file>.npy' and
+    memory-mapped on later runs, so each text file is only parsed once and
+    repeated comparisons share the same pages through the OS page cache.
+    A cache that cannot be loaded is rebuilt from the text file.
+    """
+    cache = lc_file + '.npy'
+    if has_fresh_cache(lc_file):
+        try:
+            return np.load(cache, mmap_mode='r')
+        except (OSError, ValueError, EOFError) as e:
+            print(f"Warning: rebuilding unreadable cache {cache}: {e}")
+
+    # The text files have a header line followed by data columns:
+    # # TIME(s)    MJD    RATE(cts/s)    ERROR(cts/s)
+    # pandas' C tokenizer is much faster than np.loadtxt for large files
+    data = pd.read_csv(lc_file, sep=r'\s+', header=None, comment='#', engine='c',
+                       dtype=np.float64, usecols=[0, 1, 2, 3]).to_numpy()
+
+    # Store columns contiguously so a reader that only needs some columns
+    # (e.g. the statistics-only path) pages in just those
+    data = np.asfortranarray(data)
+    
+    # Write to a temporary file in the same directory and rename it into
+    # place, so a concurrent or interrupted run never sees a partial cache
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, cache)
+    except OSError as e:
+        # A read-only data directory only costs us the cache
+        print(f"Warning: could not write cache {cache}: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+    return data
+
+def _drop_invalid_rows(data):
+    """Filter out rows with NaN (or inf) in any column in a single pass."""
+    # Any NaN or inf makes the sum non-finite, so clean files (the common
+    # case) return here without building a boolean mask at all
+    if np.isfinite(data.sum()):
+        return data
+    
+    valid_mask = np.isfinite(data).all(axis=1)
+    if not valid_mask.all():
+        data = np.compress(valid_mask, data, axis=0)
+    return data
+
+def _parse_lightcurve_path(lc_file):
+    """Extract obsid, source radius, background region and bin size from a file path."""
+    # Format: .../obsid/src015_bkg050-080_bin0.1/final_LC_src15_bkg50-80.txt
+    path_info = _LC_PATH_RE.search(lc_file)
+    if not path_info:
+        raise ValueError("path does not follow the obsid/srcNNN_bkgNNN-NNN_binX/final_LC_*.txt layout")
+    return {
+        'obsid': path_info['obsid'],
+        'src_radius': int(path_info['src_file']),
+        'bkg_region': path_info['bkg_file'],
+        'bin_size': float(path_info['bin'])
+    }
+
 def load_lightcurve_from_text(lc_file):
     """Load light curve data from a text file created by export_to_text.sh."""
     try:
-        # The text files have a header line followed by data columns:
-        # # TIME(s)    MJD    RATE(cts/s)    ERROR(cts/s)
-        data = np.loadtxt(lc_file, skiprows=1)
-        
-        # Extract data columns
-        time = data[:, 0]        # TIME(s)
-        mjd_times = data[:, 1]   # MJD
-        rate = data[:, 2]        # RATE(cts/s)
-        error = data[:, 3]       # ERROR(cts/s)
-        
-        # Filter out NaN values if any exist
-        valid_mask = ~np.isnan(rate) & ~np.isnan(time) & ~np.isnan(error)
-        if not np.all(valid_mask):
-            time = time[valid_mask]
-            mjd_times = mjd_times[valid_mask]
-            rate = rate[valid_mask]
-            error = error[valid_mask]
+        data = _drop_invalid_rows(read_lightcurve_array(lc_file))
+        
+        # Extract data columns. Absolute times stay float64 for precision;
+        # rates, errors and hours only feed plots and statistics, so float32
+        # halves the memory they occupy and stream through.
+        time = data[:, 0]                            # TIME(s)
+        mjd_times = data[:, 1]                       # MJD
+        rate = data[:, 2].astype(np.float32)         # RATE(cts/s)
+        error = data[:, 3].astype(np.float32)        # ERROR(cts/s)
         
         # Calculate hours from start
         if len(time) > 0:
             time_offset = time - time[0]  # seconds from start
-            time_hours = time_offset / 3600.0  # convert to hours
+            time_hours = (time_offset / 3600.0).astype(np.float32)  # convert to hours
         else:
-            time_hours = np.array([])
+            time_hours = np.array([], dtype=np.float32)
         
-        # Extract basic info from the filepath
-        # Format: .../obsid/src015_bkg050-080_bin0.1/final_LC_src15_bkg50-80.txt
-        dirname = os.path.basename(os.path.dirname(lc_file))  # e.g., src015_bkg050-080_bin0.1
-        obsid = os.path.basename(os.path.dirname(os.path.dirname(lc_file)))
-        bin_size = float(dirname.split('_bin')[1])
+        # Extract basic info from the filepath in a single regex match
+        lc_data = _parse_lightcurve_path(lc_file)
         exposure = time[-1] - time[0] if len(time) > 1 else 0
         
-        # Calculate basic statistics
-        mean_rate = np.mean(rate)
-        std_rate = np.std(rate)
-        max_rate = np.max(rate)
-        min_rate = np.min(rate)
+        # Calculate basic statistics in a single compiled pass
+        mean_rate, std_rate, min_rate, max_rate, mean_error = _file_stats(rate, error)
         
-        return {
-            'obsid': obsid,
+        lc_data.update({
             'exposure': exposure,
-            'bin_size': bin_size,
             'time': time,
             'mjd_times': mjd_times,
             'time_hours': time_hours,
@@ -208,14 +384,105 @@ def load_lightcurve_from_text(lc_file):
             'mean_rate': mean_rate,
             'std_rate': std_rate,
             'max_rate': max_rate,
-            'min_rate': min_rate
-        }
+            'min_rate': min_rate,
+            'mean_error': mean_error
+        })
+        return lc_data
             
     except Exception as e:
         print(f"Error reading text file {lc_file}: {e}")
         return None
 
-def plot_lightcurve_comparison_bokeh(lc_files, args):
+def load_lightcurve_stats_only(lc_file):
+    """
+    Load only the summary statistics of a light curve text file.
+
+    The columns are reduced to scalars and dropped before returning, so
+    memory stays bounded by one file however many are being compared.
+    """
+    try:
+        data = _drop_invalid_rows(read_lightcurve_array(lc_file))
+        time = data[:, 0]
+        
+        lc_stats = _parse_lightcurve_path(lc_file)
+        mean_rate, std_rate, min_rate, max_rate, mean_error = _file_stats(data[:, 2], data[:, 3])
+        
+        lc_stats.update({
+            'exposure': time[-1] - time[0] if len(time) > 1 else 0,
+            'n': len(time),
+            'mean_rate': mean_rate,
+            'std_rate': std_rate,
+            'max_rate': max_rate,
+            'min_rate': min_rate,
+            'mean_error': mean_error
+        })
+        return lc_stats
+    
+    except Exception as e:
+        print(f"Error reading text file {lc_file}: {e}")
+        return None
+
+def load_lightcurves(lc_files, loader=load_lightcurve_from_text):
+    """Load several light curve text files in parallel, keeping their order."""
+    if len(lc_files) < 2:
+        return [loader(f) for f in lc_files]
+    
+    # With every .npy cache in place a load is just an mmap plus a few numpy
+    # passes, so threads are enough and nothing is pickled back from workers
+    if all(has_fresh_cache(f) for f in lc_files):
+        with ThreadPoolExecutor() as ex:
+            return list(ex.map(loader, lc_files))
+    
+    # Text files still need parsing, so spread them over worker processes
+    with ProcessPoolExecutor() as ex:
+        return list(ex.map(loader, lc_files))
+
+def bin_average(n_target, mjd_times, hours, rate, error):
+    """
+    Average adjacent samples of a light curve down to at most n_target points.
+
+    Blocks of consecutive bins are averaged rather than strided, so short
+    flares are smoothed instead of skipped; errors add in quadrature.
+    """
+    stride = max(1, -(-len(rate) // n_target))  # ceiling division
+    starts = np.arange(0, len(rate), stride)
+    counts = np.diff(np.append(starts, len(rate)))
+    
+    def block_mean(a):
+        return (np.add.reduceat(a, starts) / counts).astype(a.dtype, copy=False)
+    
+    binned_error = (np.sqrt(np.add.reduceat(error * error, starts)) / counts).astype(error.dtype, copy=False)
+    return block_mean(mjd_times), block_mean(hours), block_mean(rate), binned_error
+
+def add_rasterized_curves(fig, curves):
+    """
+    Draw (x, y, color) curves on a Bokeh figure as a single datashader image.
+
+    Each curve is aggregated onto a canvas the size of the figure and shaded
+    in its own color, so the browser receives one image instead of every point.
+    """
+    x_min = min(x[0] for x, _, _ in curves)
+    x_max = max(x[-1] for x, _, _ in curves)
+    y_min = min(y.min() for _, y, _ in curves)
+    y_max = max(y.max() for _, y, _ in curves)
+    # Datashader needs non-empty ranges; pad degenerate ones (e.g. every
+    # point at the same time) around the data
+    if x_max == x_min:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    if y_max == y_min:
+        y_max = y_min + 1.0
+    
+    # A canvas larger than the figure only adds pixels the browser will drop
+    canvas = ds.Canvas(plot_width=fig.width, plot_height=fig.height,
+                       x_range=(x_min, x_max), y_range=(y_min, y_max))
+    images = [
+        tf.shade(canvas.line(pd.DataFrame({'x': x, 'y': y}), 'x', 'y', agg=ds.count()), cmap=[color])
+        for x, y, color in curves
+    ]
+    image = tf.stack(*images)
+    fig.image_rgba(image=[image.data], x=x_min, y=y_min, dw=x_max - x_min, dh=y_max - y_min)
+
+def plot_lightcurve_comparison_bokeh(lc_data_list, args):
     """Create comparison plot of multiple light curves using Bokeh."""
     
     # Define plot colors
@@ -262,25 +529,223 @@ def plot_lightcurve_comparison_bokeh(lc_files, args):
         width=900, height=50,
         tools="pan,wheel_zoom,box_zoom,reset,save",
         active_drag="box_zoom",
-        active
+        active_scroll="wheel_zoom",
+        toolbar_location=None,
+        x_axis_label="Time (hours from start)",
+        y_range=Range1d(start=0, end=1),  # Hide this axis area
+    )
+    
+    # Hide y-axis for hours plot
+    p_hours.yaxis.visible = False
+    p_hours.grid.visible = False
+    p_hours.outline_line_color = None
+    
+    # Format both time axes
+    p_main.xaxis.formatter = NumeralTickFormatter(format="0.00000")
+    p_residual.xaxis.formatter = NumeralTickFormatter(format="0.00000")
+    p_hours.xaxis.formatter = NumeralTickFormatter(format="0.00")
+    
+    # Per-point glyphs stop being usable in the browser beyond a few tens of
+    # thousands of points, so switch to datashader automatically
+    n_points = sum(len(lc_data['rate']) for lc_data in lc_data_list if lc_data)
+    use_datashader = args.use_datashader or n_points > DATASHADER_MIN_POINTS
+    
+    legend_items = []
+    main_curves = []
+    residual_curves = []
+    first_mjd_start = None
+    
+    for i, lc_data in enumerate(lc_data_list):
+        if not lc_data:
+            continue
+        
+        color_idx = i % len(colors)
+        color = colors[color_idx]
+        light_color = light_colors[color_idx]
+        
+        comparison_value = extract_comparison_value(lc_data, args.compare)
+        label = format_comparison_label(comparison_value, args)
+        if args.stats:
+            label += f" (mean={lc_data['mean_rate']:.2f}, σ={lc_data['std_rate']:.2f})"
+        
+        # Normalize if requested
+        y_values = lc_data['rate']
+        y_errors = lc_data['error']
+        if args.normalize:
+            y_values = y_values / lc_data['mean_rate']
+            y_errors = y_errors / lc_data['mean_rate']
+        
+        # Without datashader every point becomes a glyph, so average long
+        # curves down to a number the browser can still draw
+        mjd_times = lc_data['mjd_times']
+        hours = lc_data['time_hours']
+        if not use_datashader and len(y_values) > BOKEH_DECIMATE_MIN_POINTS:
+            print(f"  • Averaging {lc_data['obsid']} {label} from {len(y_values)} to at most {BOKEH_DECIMATE_TARGET_POINTS} points for visualization")
+            mjd_times, hours, y_values, y_errors = bin_average(
+                BOKEH_DECIMATE_TARGET_POINTS, mjd_times, hours, y_values, y_errors
+            )
+        
+        mean_value = 1.0 if args.normalize else lc_data['mean_rate']
+        residuals = (y_values - 1.0) * 100 if args.normalize else y_values - mean_value
+        
+        if use_datashader:
+            # Rasterized together after the loop; an empty line stands in
+            # for the curve in the legend
+            main_curves.append((mjd_times, y_values, color))
+            residual_curves.append((mjd_times, residuals, color))
+            legend_items.append(LegendItem(label=label, renderers=[p_main.line(x=[], y=[], color=color, line_width=4)]))
+        else:
+            # Bokeh ships every column to the browser, so send all but MJD as
+            # float32; MJD needs float64 to resolve sub-second bins
+            y_values = y_values.astype(np.float32, copy=False)
+            y_errors = y_errors.astype(np.float32, copy=False)
+            source = ColumnDataSource(data={
+                'mjd': mjd_times,
+                'hours': hours.astype(np.float32, copy=False),
+                'rate': y_values,
+                'error': y_errors,
+                'upper': y_values + y_errors,
+                'lower': y_values - y_errors,
+                'residual': residuals.astype(np.float32, copy=False),
+            })
+            
+            # Error bars and data points on the main plot
+            p_main.segment(x0='mjd', y0='lower', x1='mjd', y1='upper', source=source,
+                           color=light_color, line_width=1)
+            points = p_main.scatter(x='mjd', y='rate', source=source, size=4, color=color, alpha=0.7)
+            legend_items.append(LegendItem(label=label, renderers=[points]))
+            
+            # Deviation from the mean on the residual plot
+            p_residual.scatter(x='mjd', y='residual', source=source, size=3, color=color, alpha=0.5)
+        
+        # Mean line on the main plot
+        p_main.add_layout(Span(location=mean_value, dimension='width', line_color=color,
+                               line_dash='dashed', line_width=1))
+        
+        if first_mjd_start is None:
+            first_mjd_start = lc_data['mjd_times'][0]
+    
+    if first_mjd_start is None:
+        print("Error: none of the light curves could be loaded.")
+        return
+    
+    if main_curves:
+        add_rasterized_curves(p_main, main_curves)
+        add_rasterized_curves(p_residual, residual_curves)
+    
+    p_main.add_layout(Legend(items=legend_items, click_policy="hide"), 'right')
+    p_main.add_layout(Title(text=build_plot_title(args), text_font_size="12pt"), "above")
+    
+    # Keep the hours axis in step with the MJD axis
+    callback_to_hours = CustomJS(args=dict(p_main=p_main, p_hours=p_hours, mjd_start=first_mjd_start), code="""
+        const mjd_range = p_main.x_range;
+        const hours_range = p_hours.x_range;
+        hours_range.start = (mjd_range.start - mjd_start) * 24.0;
+        hours_range.end = (mjd_range.end - mjd_start) * 24.0;
+    """)
+    p_main.x_range.js_on_change('start', callback_to_hours)
+    p_main.x_range.js_on_change('end', callback_to_hours)
+    
+    # Arrange the plots
+    layout = column(p_main, p_residual, p_hours)
+    
+    bokeh_output_file(args.output)
+    save(layout)
+    print(f"Interactive plot saved to: {args.output}")
+    
+    # Also show in browser
+    show(layout)
+
+def plot_lightcurve_comparison(lc_data_list, args):
+    """Create comparison plot of multiple light curves using matplotlib."""
+    
+    # Interactive HTML output is produced with Bokeh instead
+    if args.output and args.output.lower().endswith('.html'):
+        plot_lightcurve_comparison_bokeh(lc_data_list, args)
+        return
+    
+    # Define plot colors
+    colors = ['blue', 'red', 'green', 'purple', 'orange', 'brown', 'magenta', 'gray', 'olive', 'cyan']
+    
+    # Main panel for the light curves, smaller panel for the deviations
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), sharex=True,
+                                   gridspec_kw={'height_ratios': [3, 1]})
+    
+    legend_elements = []
+    mjd_parts, y_parts, err_parts, residual_parts, group_parts = [], [], [], [], []
+    t_min, t_max = np.inf, -np.inf
+    r_min, r_max = np.inf, -np.inf
+    
+    for i, lc_data in enumerate(lc_data_list):
+        if not lc_data:
+            continue
+        
+        color_idx = i % len(colors)
+        color = colors[color_idx]
+        comparison_value = extract_comparison_value(lc_data, args.compare)
+        label = format_comparison_label(comparison_value, args)
+        
+        # Show statistics in legend if requested
+        if args.stats:
+            label += f" (mean={lc_data['mean_rate']:.2f}, σ={lc_data['std_rate']:.2f})"
+        
+        # Normalize if requested
+        y_values = lc_data['rate']
+        y_errors = lc_data['error']
+        if args.normalize:
+            y_values = y_values / lc_data['mean_rate']
+            y_errors = y_errors / lc_data['mean_rate']
+        
+        # Collect the curve; all curves are drawn together after the loop
+        mjd_parts.append(lc_data['mjd_times'])
+        y_parts.append(y_values)
+        err_parts.append(y_errors)
+        group_parts.append(np.full(len(y_values), color_idx, dtype=np.int8))
+        legend_elements.append(Line2D([], [], marker='o', markersize=4, linestyle='none',
+                                      color=color, alpha=0.5, label=label))
+        
+        # Add mean line
+        if args.normalize:
+            ax1.axhline(y=1.0, color=color, linestyle='--', alpha=0.5)
+        else:
             ax1.axhline(y=lc_data['mean_rate'], color=color, linestyle='--', alpha=0.5)
         
-        # Plot on secondary panel (Relative flux)
+        # Secondary panel (Relative flux)
         if args.normalize:
             # For normalized view, show fractional difference from mean (in %)
-            ax2.plot(lc_data['mjd_times'], (y_values - 1.0) * 100, '.', color=color, alpha=0.7, markersize=2)
+            residual_parts.append((y_values - 1.0) * 100)
         else:
             # For non-normalized, show absolute difference from mean
-            ax2.plot(lc_data['mjd_times'], y_values - lc_data['mean_rate'], '.', color=color, alpha=0.7, markersize=2)
+            residual_parts.append(y_values - lc_data['mean_rate'])
         
-        # Track data ranges for axis limits
-        all_times.extend(lc_data['mjd_times'])
-        all_rates.extend(y_values)
+        # Track data ranges for axis limits from the per-file extremes
+        if len(lc_data['mjd_times']) > 0:
+            scale = lc_data['mean_rate'] if args.normalize else 1.0
+            t_min = min(t_min, lc_data['mjd_times'][0])
+            t_max = max(t_max, lc_data['mjd_times'][-1])
+            # Dividing by a negative mean swaps which extreme is smaller
+            lo = lc_data['min_rate'] / scale
+            hi = lc_data['max_rate'] / scale
+            r_min = min(r_min, lo, hi)
+            r_max = max(r_max, lo, hi)
+    
+    # Draw every curve as one artist per panel, colored by its group id,
+    # instead of one errorbar container and one line per file
+    if mjd_parts:
+        mjd_all = np.concatenate(mjd_parts)
+        y_all = np.concatenate(y_parts)
+        err_all = np.concatenate(err_parts)
+        groups = np.concatenate(group_parts)
         
-        # Show statistics in legend if requested
-        if args.stats:
-            stats_text = f" (mean={lc_data['mean_rate']:.2f}, σ={lc_data['std_rate']:.2f})"
-            legend_elements[-1].set_label(f"{legend_elements[-1].get_label()}{stats_text}")
+        segments = np.empty((len(mjd_all), 2, 2))
+        segments[:, :, 0] = mjd_all[:, None]
+        segments[:, 0, 1] = y_all - err_all
+        segments[:, 1, 1] = y_all + err_all
+        ax1.add_collection(LineCollection(segments, colors=to_rgba_array(colors, alpha=0.5)[groups],
+                                          linewidths=0.5))
+        ax1.scatter(mjd_all, y_all, s=4, c=to_rgba_array(colors, alpha=0.5)[groups], linewidths=0)
+        ax2.scatter(mjd_all, np.concatenate(residual_parts), s=4,
+                    c=to_rgba_array(colors, alpha=0.7)[groups], linewidths=0)
     
     # Set axis labels
     if args.normalize:
@@ -299,51 +764,20 @@ def plot_lightcurve_comparison_bokeh(lc_files, args):
         ax.xaxis.set_major_formatter(mjd_formatter)
         plt.setp(ax.get_xticklabels(), rotation=45)
     
-    # Set title based on the comparison type
-    if args.title:
-        title = args.title
-    else:
-        # Construct title based on fixed parameters
-        title_parts = []
-        
-        if args.obs and args.compare != 'observations':
-            title_parts.append(f"ObsID: {args.obs}")
-        
-        if args.src and args.compare != 'source_radius':
-            title_parts.append(f"Source: {args.src} arcsec")
-            
-        if args.bkg and args.compare != 'background':
-            title_parts.append(f"Background: {args.bkg}")
-            
-        if args.bin and args.compare != 'binning':
-            title_parts.append(f"Bin: {args.bin} s")
-            
-        comparison_name = {
-            'source_radius': 'Source Radius',
-            'background': 'Background Region',
-            'binning': 'Time Binning',
-            'observations': 'Observations'
-        }
-        
-        title = f"Comparison of {comparison_name[args.compare]}\n{', '.join(title_parts)}"
-    
-    ax1.set_title(title)
+    ax1.set_title(build_plot_title(args))
     
     # Add grid
     ax1.grid(True, alpha=0.3)
     ax2.grid(True, alpha=0.3)
     
     # Set axis limits with padding
-    if all_times:
-        time_range = max(all_times) - min(all_times)
-        time_padding = time_range * 0.02
-        ax1.set_xlim(min(all_times) - time_padding, max(all_times) + time_padding)
-        ax2.set_xlim(min(all_times) - time_padding, max(all_times) + time_padding)
-    
-    if all_rates:
-        rate_range = max(all_rates) - min(all_rates)
-        rate_padding = rate_range * 0.05
-        ax1.set_ylim(min(all_rates) - rate_padding, max(all_rates) + rate_padding)
+    if t_min <= t_max:
+        time_padding = (t_max - t_min) * 0.02
+        ax1.set_xlim(t_min - time_padding, t_max + time_padding)
+        ax2.set_xlim(t_min - time_padding, t_max + time_padding)
+        
+        rate_padding = (r_max - r_min) * 0.05
+        ax1.set_ylim(r_min - rate_padding, r_max + rate_padding)
     
     # Add legend
     ax1.legend(handles=legend_elements, loc='upper right')
@@ -359,22 +793,23 @@ def plot_lightcurve_comparison_bokeh(lc_files, args):
     # Show the plot
     plt.show()
 
-def get_comparison_statistics(lc_files, args):
+def get_comparison_statistics(lc_data_list, args):
     """Generate detailed statistics for the comparison."""
     stats = []
     
-    for lc_file in lc_files:
-        lc_data = load_lightcurve_from_text(lc_file)
+    # Only the scalar summaries are used, so this works on both full and
+    # stats-only loads
+    for lc_data in lc_data_list:
         if not lc_data:
             continue
             
-        comparison_value = extract_comparison_value(lc_file, args.compare)
+        comparison_value = extract_comparison_value(lc_data, args.compare)
         
         # Calculate additional statistics
         rms_var = lc_data['std_rate'] / lc_data['mean_rate'] * 100  # RMS variability in percent
         
         # Signal-to-noise estimate (mean / mean_error)
-        mean_error = np.mean(lc_data['error'])
+        mean_error = lc_data['mean_error']
         snr = lc_data['mean_rate'] / mean_error if mean_error > 0 else 0
         
         stats.append({
@@ -438,15 +873,22 @@ def main():
         for f in lc_files[:3]:
             print(f"  - {f}")
     
-    # Calculate statistics
-    stats = get_comparison_statistics(lc_files, args)
+    # Statistics without a plot never need the full columns
+    if args.stats_only:
+        lc_stats_list = load_lightcurves(lc_files, loader=load_lightcurve_stats_only)
+        print_comparison_statistics(get_comparison_statistics(lc_stats_list, args), args)
+        return
+    
+    # Load each file once for both the statistics and the plot
+    lc_data_list = load_lightcurves(lc_files)
     
-    # Print statistics if requested
+    # Calculate and print statistics if requested
     if args.stats:
+        stats = get_comparison_statistics(lc_data_list, args)
         print_comparison_statistics(stats, args)
     
     # Create comparison plot
-    plot_lightcurve_comparison(lc_files, args)
+    plot_lightcurve_comparison(lc_data_list, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
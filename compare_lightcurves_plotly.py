@@ -11,15 +11,45 @@ Usage examples:
 
 import os
 import sys
-import glob
+import re
+import fnmatch
+import pickle
+import stat
 import argparse
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 # Plotly imports (replacing Bokeh)
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+# MinMaxLTTB point selection, if tsdownsample is installed
+try:
+    from tsdownsample import MinMaxLTTBDownsampler
+except ImportError:
+    MinMaxLTTBDownsampler = None
+
+# Matplotlib for quick static images
+from matplotlib.figure import Figure
+
+# Number of points each trace is downsampled to; a static image is only
+# ~1000 px wide, so kaleido gets fewer markers to draw
+MAX_SHOWN_POINTS = 5000
+PNG_SHOWN_POINTS = 1000
+
+# Observation, bin size, source radius and background parts of a light curve path
+_LC_PATH_RE = re.compile(
+    r'(?P<obsid>[^/\\]+)[/\\][^/\\]*_bin(?P<bin>[\d.]+)[/\\]'
+    r'final_LC_src(?P<src>\d+)_bkg(?P<bkg>[^./\\]+)\.txt$'
+)
+
+# Observation directories are named by their all-digit ObsID
+_OBSID_DIR_RE = re.compile(r'^\d{10,}$')
+
+# Directory listings reused between runs while the directories are unchanged
+DIR_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'compare_lc', 'scandir.pkl')
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Compare NuSTAR light curves across different parameters.')
@@ -41,9 +71,108 @@ def parse_arguments():
     parser.add_argument('--stats', action='store_true', help='Include detailed statistics in the output')
     parser.add_argument('--normalize', action='store_true', help='Normalize light curves to their means for easier comparison')
     parser.add_argument('--list-all', action='store_true', help='List all found files instead of just the first few')
+    parser.add_argument('--backend', choices=['plotly', 'matplotlib'], default='plotly',
+                        help='Plotting library for PNG output; matplotlib avoids starting kaleido (HTML always uses Plotly)')
     
     return parser.parse_args()
 
+def _load_dir_cache():
+    """Load the cached directory listings, or start an empty cache."""
+    try:
+        with open(DIR_CACHE_FILE, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+def _save_dir_cache(dir_cache):
+    """Write the cached directory listings back atomically."""
+    try:
+        os.makedirs(os.path.dirname(DIR_CACHE_FILE), exist_ok=True)
+        tmp_file = f"{DIR_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(dir_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, DIR_CACHE_FILE)
+    except OSError as e:
+        # An unwritable cache only costs us the speed-up next time
+        print(f"Warning: could not write directory cache {DIR_CACHE_FILE}: {e}")
+
+def _list_dir(path, dir_cache):
+    """
+    Return (name, is_dir) pairs for the entries of a directory.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so a cached listing is reused while the mtime matches
+    and only a single stat is paid instead of a full listing.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cached = dir_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    # is_dir() is answered from the directory listing when the filesystem
+    # reports entry types, so no stat call is made per entry
+    with os.scandir(path) as it:
+        entries = [(entry.name, entry.is_dir()) for entry in it]
+    dir_cache[path] = (mtime, entries)
+    return entries
+
+def _compile_level(pattern):
+    """
+    Prepare one path level for matching.
+
+    Literal names are kept as strings so they can be checked with a single
+    stat; fnmatch patterns are compiled once; compiled regexes pass through.
+    """
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    if not any(c in pattern for c in '*?['):
+        return pattern
+    return re.compile(fnmatch.translate(pattern))
+
+def _scan_matching(path, matcher, want_dir, dir_cache):
+    """Yield paths in a directory whose names match matcher, like one glob level."""
+    if isinstance(matcher, str):
+        # A literal name needs no directory listing, just one stat
+        candidate = os.path.join(path, matcher)
+        try:
+            is_dir = stat.S_ISDIR(os.stat(candidate).st_mode)
+        except OSError:
+            return
+        if is_dir == want_dir:
+            yield candidate
+        return
+    
+    try:
+        entries = _list_dir(path, dir_cache)
+    except OSError:
+        return
+    for name, is_dir in entries:
+        # As with glob, wildcards do not match hidden names
+        if name.startswith('.') or not matcher.match(name):
+            continue
+        if is_dir == want_dir:
+            yield os.path.join(path, name)
+
+def _scan_lightcurve_files(base_dir, obs_pattern, dir_pattern, file_pattern):
+    """
+    Return the paths matching base_dir/obs_pattern/dir_pattern/file_pattern.
+
+    Equivalent to glob.glob on the joined pattern, but only levels with
+    wildcards are listed, each once with os.scandir and each pattern
+    compiled once, and listings of unchanged directories are reused from
+    earlier runs. obs_pattern may also be a compiled regex.
+    """
+    obs_match, dir_match, file_match = (_compile_level(p) for p in (obs_pattern, dir_pattern, file_pattern))
+    dir_cache = _load_dir_cache()
+    files = [
+        lc_path
+        for obs_path in _scan_matching(base_dir, obs_match, True, dir_cache)
+        for combo_path in _scan_matching(obs_path, dir_match, True, dir_cache)
+        for lc_path in _scan_matching(combo_path, file_match, False, dir_cache)
+    ]
+    _save_dir_cache(dir_cache)
+    return files
+
 def find_lightcurve_files(args):
     """Find light curve text files based on the comparison type and parameters."""
     base_dir = args.lightcurves_dir
@@ -57,8 +186,7 @@ def find_lightcurve_files(args):
             
         # Look for all source radii for this observation/bin/background
         # Adjust pattern to handle the different filename format for bkg in folders vs filenames
-        pattern = os.path.join(base_dir, args.obs, f"src*_bkg{args.bkg}_bin{args.bin}", "final_LC_src*_bkg*.txt")
-        files = glob.glob(pattern)
+        files = _scan_lightcurve_files(base_dir, args.obs, f"src*_bkg{args.bkg}_bin{args.bin}", "final_LC_src*_bkg*.txt")
         
         # Filter to keep only files matching the correct background
         # In filenames, "050-080" becomes "50-80", so we need to handle this conversion
@@ -72,8 +200,7 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for all background regions for this observation/source/bin
-        pattern = os.path.join(base_dir, args.obs, f"src{int(args.src):03d}_bkg*_bin{args.bin}", f"final_LC_src{args.src}_bkg*.txt")
-        files = glob.glob(pattern)
+        files = _scan_lightcurve_files(base_dir, args.obs, f"src{int(args.src):03d}_bkg*_bin{args.bin}", f"final_LC_src{args.src}_bkg*.txt")
         
     elif args.compare == 'binning':
         # Find light curves with different time binnings
@@ -82,12 +209,10 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for all bin sizes for this observation/source/background
-        pattern = os.path.join(base_dir, args.obs, f"src{int(args.src):03d}_bkg{args.bkg}_bin*", "final_LC_src*.txt")
-        
         # Filter to keep only files matching the correct source/background
         bkg_adjusted = f"{int(args.bkg.split('-')[0])}-{int(args.bkg.split('-')[1])}"
         src_adjusted = args.src
-        files = glob.glob(pattern)
+        files = _scan_lightcurve_files(base_dir, args.obs, f"src{int(args.src):03d}_bkg{args.bkg}_bin*", "final_LC_src*.txt")
         files = [f for f in files if f"src{src_adjusted}_bkg{bkg_adjusted}" in os.path.basename(f)]
         
     elif args.compare == 'observations':
@@ -97,12 +222,12 @@ def find_lightcurve_files(args):
             sys.exit(1)
             
         # Look for this src/bkg/bin across all observations
-        pattern = os.path.join(base_dir, "*", f"src{int(args.src):03d}_bkg{args.bkg}_bin{args.bin}", "final_LC_src*.txt")
-        
         # Filter to keep only files matching the correct source/background
         bkg_adjusted = f"{int(args.bkg.split('-')[0])}-{int(args.bkg.split('-')[1])}"
         src_adjusted = args.src
-        files = glob.glob(pattern)
+        # Only ObsID directories are descended into, and the combination
+        # directory inside each is looked up by name rather than listed
+        files = _scan_lightcurve_files(base_dir, _OBSID_DIR_RE, f"src{int(args.src):03d}_bkg{args.bkg}_bin{args.bin}", "final_LC_src*.txt")
         files = [f for f in files if f"src{src_adjusted}_bkg{bkg_adjusted}" in os.path.basename(f)]
     
     if not files:
@@ -113,50 +238,47 @@ def find_lightcurve_files(args):
         
     return sorted(files)
 
-def extract_comparison_value(filepath, compare_type):
-    """Extract the value being compared from the filepath."""
-    basename = os.path.basename(filepath)
-    dirname = os.path.basename(os.path.dirname(filepath))
-    obsid = os.path.basename(os.path.dirname(os.path.dirname(filepath)))
-    
-    if compare_type == 'source_radius':
-        # Extract source radius from the filename (e.g., final_LC_src15_bkg50-80.txt)
-        return int(basename.split('_src')[1].split('_')[0])
-        
-    elif compare_type == 'background':
-        # Extract background region from the filename
-        return basename.split('_bkg')[1].split('.')[0]
-        
-    elif compare_type == 'binning':
-        # Extract bin size from the directory name
-        return float(dirname.split('_bin')[1])
-        
-    elif compare_type == 'observations':
-        # Return the observation ID
-        return obsid
-        
-    return None
+def extract_comparison_values(lc_files, compare_type):
+    """Map each filepath to the value being compared, parsing every path once."""
+    values = {}
+    for lc_file in lc_files:
+        # Format: .../obsid/src015_bkg050-080_bin0.1/final_LC_src15_bkg50-80.txt
+        path_info = _LC_PATH_RE.search(lc_file)
+        if not path_info:
+            values[lc_file] = None
+        elif compare_type == 'source_radius':
+            # Source radius from the filename (e.g., final_LC_src15_bkg50-80.txt)
+            values[lc_file] = int(path_info['src'])
+        elif compare_type == 'background':
+            # Background region from the filename
+            values[lc_file] = path_info['bkg']
+        elif compare_type == 'binning':
+            # Bin size from the directory name
+            values[lc_file] = float(path_info['bin'])
+        elif compare_type == 'observations':
+            # The observation ID
+            values[lc_file] = path_info['obsid']
+    return values
 
 def load_lightcurve_from_text(lc_file):
     """Load light curve data from a text file created by export_to_text.sh."""
     try:
         # The text files have a header line followed by data columns:
         # # TIME(s)    MJD    RATE(cts/s)    ERROR(cts/s)
-        data = np.loadtxt(lc_file, skiprows=1)
-        
-        # Extract data columns
-        time = data[:, 0]        # TIME(s)
-        mjd_times = data[:, 1]   # MJD
-        rate = data[:, 2]        # RATE(cts/s)
-        error = data[:, 3]       # ERROR(cts/s)
+        # pandas' C parser is much faster than np.loadtxt; times stay float64
+        # for precision while rates and errors fit comfortably in float32
+        df = pd.read_csv(lc_file, sep=r'\s+', comment='#', header=None, engine='c',
+                         names=['TIME', 'MJD', 'RATE', 'ERROR'],
+                         dtype={'TIME': np.float64, 'MJD': np.float64, 'RATE': np.float32, 'ERROR': np.float32})
         
         # Filter out NaN values if any exist
-        valid_mask = ~np.isnan(rate) & ~np.isnan(time) & ~np.isnan(error)
-        if not np.all(valid_mask):
-            time = time[valid_mask]
-            mjd_times = mjd_times[valid_mask]
-            rate = rate[valid_mask]
-            error = error[valid_mask]
+        df = df.dropna(subset=['RATE', 'TIME', 'ERROR'])
+        
+        # Extract data columns, each contiguous in memory as tsdownsample requires
+        time = df['TIME'].to_numpy()        # TIME(s)
+        mjd_times = df['MJD'].to_numpy()    # MJD
+        rate = df['RATE'].to_numpy()        # RATE(cts/s)
+        error = df['ERROR'].to_numpy()      # ERROR(cts/s)
         
         # Calculate hours from start
         if len(time) > 0:
@@ -173,8 +295,8 @@ def load_lightcurve_from_text(lc_file):
         exposure = time[-1] - time[0] if len(time) > 1 else 0
         
         # Calculate basic statistics
-        mean_rate = np.mean(rate)
-        std_rate = np.std(rate)
+        mean_rate = np.mean(rate, dtype=np.float64)
+        std_rate = np.std(rate, dtype=np.float64)
         max_rate = np.max(rate)
         min_rate = np.min(rate)
         
@@ -238,114 +360,231 @@ def hex_to_rgb(hex_color):
     # Default fallback
     return (0.5, 0.5, 0.5)
 
-def plot_lightcurve_comparison(lc_files, args):
+# Error band fill colors, matching the plot colors by index; converted once here
+# rather than per light curve
+LIGHT_COLORS = ['lightblue', 'salmon', 'lightgreen', 'plum', 'bisque', 'sandybrown', 'pink', 'lightgray', 'khaki', 'lightcyan']
+LIGHT_FILL_RGBA = [f"rgba({int(r * 255)}, {int(g * 255)}, {int(b * 255)}, 0.3)"
+                   for r, g, b in (hex_to_rgb(c) for c in LIGHT_COLORS)]
+
+def format_comparison_label(comparison_value, args):
+    """Format the compared value of one light curve for legends."""
+    if args.compare == 'source_radius':
+        return f"{comparison_value} arcsec"
+    elif args.compare == 'background':
+        return f"bkg {comparison_value}"
+    elif args.compare == 'binning':
+        if comparison_value < 1:
+            return f"{comparison_value*1000:.0f} ms"
+        return f"{comparison_value:.2f} s"
+    elif args.compare == 'observations':
+        return f"ObsID {comparison_value}"
+
+def build_plot_title(args):
+    """Build the plot title from the fixed comparison parameters."""
+    if args.title:
+        title = args.title
+    else:
+        # Construct title based on fixed parameters
+        title_parts = []
+
+        if args.obs and args.compare != 'observations':
+            title_parts.append(f"ObsID: {args.obs}")
+
+        if args.src and args.compare != 'source_radius':
+            title_parts.append(f"Source: {args.src} arcsec")
+
+        if args.bkg and args.compare != 'background':
+            title_parts.append(f"Background: {args.bkg}")
+
+        if args.bin and args.compare != 'binning':
+            title_parts.append(f"Bin: {args.bin} s")
+
+        comparison_name = {
+            'source_radius': 'Source Radius',
+            'background': 'Background Region',
+            'binning': 'Time Binning',
+            'observations': 'Observations'
+        }
+
+        title = f"Comparison of {comparison_name[args.compare]}"
+        if title_parts:
+            title += f" ({', '.join(title_parts)})"
+    
+    return title
+
+def get_output_file(args):
+    """Return the output filename, defaulting to one named after the comparison."""
+    if args.output:
+        output_file = args.output
+        # If it doesn't end with .png or .html, add .png
+        if not (output_file.lower().endswith('.png') or output_file.lower().endswith('.html')):
+            output_file = f"{output_file}.png"
+    else:
+        # Create default output filename based on comparison parameters
+        if args.compare == 'source_radius':
+            filename = f"compare_src_obs{args.obs}_bin{args.bin}_bkg{args.bkg}.png"
+        elif args.compare == 'background':
+            filename = f"compare_bkg_obs{args.obs}_src{args.src}_bin{args.bin}.png"
+        elif args.compare == 'binning':
+            filename = f"compare_bin_obs{args.obs}_src{args.src}_bkg{args.bkg}.png"
+        elif args.compare == 'observations':
+            filename = f"compare_obs_src{args.src}_bkg{args.bkg}_bin{args.bin}.png"
+
+        output_file = os.path.join(os.getcwd(), filename)
+    
+    return output_file
+
+def plot_lightcurve_comparison_matplotlib(lc_cache, comparison_values, args, output_file):
+    """Create the same comparison plot as a static matplotlib image."""
+    
+    # Define plot colors
+    colors = ['blue', 'red', 'green', 'purple', 'orange', 'brown', 'magenta', 'gray', 'olive', 'cyan']
+    
+    # Main panel for the light curves, smaller panel for the residuals
+    fig = Figure(figsize=(10, 8))
+    ax1, ax2 = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [4, 1]})
+    
+    for i, (lc_file, lc_data) in enumerate(lc_cache.items()):
+        color = colors[i % len(colors)]
+        
+        if not lc_data:
+            continue
+        
+        label = format_comparison_label(comparison_values[lc_file], args)
+        if args.stats:
+            label += f" (mean={lc_data['mean_rate']:.2f}, σ={lc_data['std_rate']:.2f})"
+        
+        # Normalize if requested
+        y_values = lc_data['rate']
+        y_errors = lc_data['error']
+        if args.normalize:
+            y_values = y_values / lc_data['mean_rate']
+            y_errors = y_errors / lc_data['mean_rate']
+        mean_value = 1.0 if args.normalize else lc_data['mean_rate']
+        residuals = (y_values - 1.0) * 100 if args.normalize else y_values - mean_value
+        
+        ax1.errorbar(lc_data['mjd_times'], y_values, yerr=y_errors, fmt='.', markersize=2,
+                     color=color, elinewidth=0.5, alpha=0.5, label=label)
+        ax1.axhline(mean_value, color=color, linestyle='--', linewidth=1)
+        ax2.plot(lc_data['mjd_times'], residuals, '.', color=color, markersize=2, alpha=0.5)
+    
+    ax1.set_title(build_plot_title(args))
+    ax1.set_ylabel("Count Rate (counts/s)" if not args.normalize else "Normalized Count Rate")
+    ax2.set_ylabel("Deviation from Mean" if not args.normalize else "% Deviation from Mean")
+    ax2.set_xlabel("Time (MJD)")
+    ax2.ticklabel_format(axis='x', useOffset=False)
+    ax1.legend(loc='upper right')
+    ax1.grid(True, alpha=0.3)
+    ax2.grid(True, alpha=0.3)
+    
+    fig.tight_layout()
+    fig.savefig(output_file, dpi=150)
+    print(f"Plot saved to PNG: {output_file}")
+
+def plot_lightcurve_comparison(lc_cache, comparison_values, args):
     """Create comparison plot of multiple light curves using Plotly."""
     
+    # Static images are much quicker from matplotlib than through kaleido
+    output_file = get_output_file(args)
+    if args.backend == 'matplotlib' and not output_file.lower().endswith('.html'):
+        plot_lightcurve_comparison_matplotlib(lc_cache, comparison_values, args, output_file)
+        return
+    
     # Define plot colors
     colors = ['blue', 'red', 'green', 'purple', 'orange', 'brown', 'magenta', 'gray', 'olive', 'cyan']
-    light_colors = ['lightblue', 'salmon', 'lightgreen', 'plum', 'bisque', 'sandybrown', 'pink', 'lightgray', 'khaki', 'lightcyan']
+    
+    n_shown = MAX_SHOWN_POINTS if output_file.lower().endswith('.html') else PNG_SHOWN_POINTS
     
     # Create subplots: 2 rows (main plot + residuals), 1 column, shared x-axis
     fig = make_subplots(rows=2, cols=1, 
-                       shared_xaxes=True,
-                       subplot_titles=["Light Curve", "Residuals"],
-                       vertical_spacing=0.1,
-                       row_heights=[0.8, 0.2])
+                        shared_xaxes=True,
+                        subplot_titles=["Light Curve", "Residuals"],
+                        vertical_spacing=0.1,
+                        row_heights=[0.8, 0.2])
     
     # Track MJD range for secondary x-axis
     min_mjd = None
     first_mjd_start = None
     
-    # Load and plot each light curve
-    for i, lc_file in enumerate(lc_files):
+    # Mean lines, added to the layout in one go after the loop
+    mean_shapes = []
+    
+    # Plot each loaded light curve
+    for i, (lc_file, lc_data) in enumerate(lc_cache.items()):
         color_idx = i % len(colors)
         color = colors[color_idx]
-        light_color = light_colors[color_idx]
         
-        lc_data = load_lightcurve_from_text(lc_file)
         if not lc_data:
             continue
             
-        comparison_value = extract_comparison_value(lc_file, args.compare)
+        comparison_value = comparison_values[lc_file]
         
         # Format the comparison value for display
-        if args.compare == 'source_radius':
-            label = f"{comparison_value} arcsec"
-        elif args.compare == 'background':
-            label = f"bkg {comparison_value}"
-        elif args.compare == 'binning':
-            if comparison_value < 1:
-                label = f"{comparison_value*1000:.0f} ms"
-            else:
-                label = f"{comparison_value:.2f} s"
-        elif args.compare == 'observations':
-            label = f"ObsID {comparison_value}"
+        label = format_comparison_label(comparison_value, args)
             
         # Add statistics to label if requested
         if args.stats:
             label += f" (mean={lc_data['mean_rate']:.2f}, σ={lc_data['std_rate']:.2f})"
         
-        # Normalize if requested
-        y_values = lc_data['rate'].copy()
-        y_errors = lc_data['error'].copy()
+        # Normalize if requested; nothing below writes in place, so the
+        # loaded arrays are used directly and only normalizing allocates
+        y_values = lc_data['rate']
+        y_errors = lc_data['error']
         
         if args.normalize:
             y_values = y_values / lc_data['mean_rate']
             y_errors = y_errors / lc_data['mean_rate']
         
-        # Downsample if too many points to avoid slow rendering
-        max_points = 5000
-        if len(y_values) > max_points:
-            step = len(y_values) // max_points
-            plot_indices = np.arange(0, len(y_values), step)
-            print(f"  • Downsampling {lc_file} from {len(y_values)} to {len(plot_indices)} points for visualization")
-            
-            mjd_times = lc_data['mjd_times'][plot_indices]
-            hours = lc_data['time_hours'][plot_indices]
-            y_values = y_values[plot_indices]
-            y_errors = y_errors[plot_indices]
-        else:
-            mjd_times = lc_data['mjd_times']
-            hours = lc_data['time_hours']
+        mjd_times = lc_data['mjd_times']
+        hours = lc_data['time_hours']
         
         # Track the first MJD for hours calculations
         if min_mjd is None:
             min_mjd = mjd_times.min()
             first_mjd_start = min_mjd
-            
-        # Add error bars to main plot
-        fig.add_trace(
-            go.Scatter(
-                x=mjd_times,
-                y=y_values + y_errors,
-                mode='lines',
-                line=dict(width=0),
-                showlegend=False,
-                hoverinfo='skip'
-            ),
-            row=1, col=1
-        )
         
+        # Downsample long curves once for every trace of this light curve.
+        # MinMaxLTTB keeps flares and dips that a fixed stride would skip;
+        # without tsdownsample fall back to the stride
+        if len(y_values) > n_shown:
+            if MinMaxLTTBDownsampler is not None:
+                idx = MinMaxLTTBDownsampler().downsample(mjd_times, y_values, n_out=n_shown)
+            else:
+                idx = np.arange(0, len(y_values), -(-len(y_values) // n_shown))
+            print(f"  • Downsampling {lc_file} from {len(y_values)} to {len(idx)} points for visualization")
+            mjd_times, hours = mjd_times[idx], hours[idx]
+            y_values, y_errors = y_values[idx], y_errors[idx]
+        
+        # Build the band as one closed polygon, along the upper envelope and
+        # back along the lower one, writing both halves straight into place
+        n_band = len(mjd_times)
+        band_x = np.concatenate([mjd_times, mjd_times[::-1]])
+        band_y = np.empty(2 * n_band, dtype=y_values.dtype)
+        np.add(y_values, y_errors, out=band_y[:n_band])
+        np.subtract(y_values[::-1], y_errors[::-1], out=band_y[n_band:])
+            
+        # Add error band to main plot
         fig.add_trace(
             go.Scatter(
-                x=mjd_times,
-                y=y_values - y_errors,
+                x=band_x,
+                y=band_y,
                 mode='lines',
                 line=dict(width=0),
-                fill='tonexty',
-                fillcolor=f'rgba{tuple(int(c * 255) for c in hex_to_rgb(light_color)) + (0.3,)}',
+                fill='toself',
+                fillcolor=LIGHT_FILL_RGBA[color_idx],
                 showlegend=False,
                 hoverinfo='skip'
             ),
             row=1, col=1
         )
         
-        # Add main data points
+        # Add main data points (WebGL, which stays responsive with many points)
         fig.add_trace(
-            go.Scatter(
+            go.Scattergl(
                 x=mjd_times,
                 y=y_values,
-                mode='markers' if len(mjd_times) > 1000 else 'lines+markers',
+                customdata=hours,
+                mode='lines+markers',
                 name=label,
                 line=dict(color=color),
                 marker=dict(color=color, size=4, opacity=0.7),
@@ -354,28 +593,30 @@ def plot_lightcurve_comparison(lc_files, args):
                     'Hours: %{customdata:.2f}<br>' +
                     'Rate: %{y:.3f} cts/s<br>' +
                     '<extra></extra>'
-                ),
-                customdata=hours
+                )
             ),
             row=1, col=1
         )
         
         # Add mean line
         mean_value = 1.0 if args.normalize else lc_data['mean_rate']
-        fig.add_shape(
+        mean_shapes.append(dict(
             type="line",
+            xref="x", yref="y",
             x0=mjd_times.min(),
             x1=mjd_times.max(),
             y0=mean_value,
             y1=mean_value,
-            line=dict(color=color, dash="dash", width=1),
-            row=1, col=1
-        )
+            line=dict(color=color, dash="dash", width=1)
+        ))
+        
+        # Plot residuals, computed in place in a fresh buffer per curve
+        residuals = np.subtract(y_values, mean_value, out=np.empty_like(y_values))
+        if args.normalize:
+            np.multiply(residuals, 100, out=residuals)
         
-        # Plot residuals 
-        residuals = y_values - mean_value if not args.normalize else (y_values - 1.0) * 100
         fig.add_trace(
-            go.Scatter(
+            go.Scattergl(
                 x=mjd_times,
                 y=residuals,
                 mode='markers',
@@ -390,38 +631,11 @@ def plot_lightcurve_comparison(lc_files, args):
             row=2, col=1
         )
     
-    # Set title based on the comparison type
-    if args.title:
-        title = args.title
-    else:
-        # Construct title based on fixed parameters
-        title_parts = []
-        
-        if args.obs and args.compare != 'observations':
-            title_parts.append(f"ObsID: {args.obs}")
-        
-        if args.src and args.compare != 'source_radius':
-            title_parts.append(f"Source: {args.src} arcsec")
-            
-        if args.bkg and args.compare != 'background':
-            title_parts.append(f"Background: {args.bkg}")
-            
-        if args.bin and args.compare != 'binning':
-            title_parts.append(f"Bin: {args.bin} s")
-            
-        comparison_name = {
-            'source_radius': 'Source Radius',
-            'background': 'Background Region',
-            'binning': 'Time Binning',
-            'observations': 'Observations'
-        }
-        
-        title = f"Comparison of {comparison_name[args.compare]}"
-        if title_parts:
-            title += f" ({', '.join(title_parts)})"
+    title = build_plot_title(args)
     
-    # Update layout with title and axis labels
+    # Update layout with title, axis labels and the mean lines
     fig.update_layout(
+        shapes=mean_shapes,
         title=dict(
             text=title,
             x=0.5,
@@ -456,25 +670,6 @@ def plot_lightcurve_comparison(lc_files, args):
         row=2, col=1
     )
     
-    # Create output filename
-    if args.output:
-        output_file = args.output
-        # If it doesn't end with .png or .html, add .png
-        if not (output_file.lower().endswith('.png') or output_file.lower().endswith('.html')):
-            output_file = f"{output_file}.png"
-    else:
-        # Create default output filename based on comparison parameters
-        if args.compare == 'source_radius':
-            filename = f"compare_src_obs{args.obs}_bin{args.bin}_bkg{args.bkg}.png"
-        elif args.compare == 'background':
-            filename = f"compare_bkg_obs{args.obs}_src{args.src}_bin{args.bin}.png"
-        elif args.compare == 'binning':
-            filename = f"compare_bin_obs{args.obs}_src{args.src}_bkg{args.bkg}.png"
-        elif args.compare == 'observations':
-            filename = f"compare_obs_src{args.src}_bkg{args.bkg}_bin{args.bin}.png"
-        
-        output_file = os.path.join(os.getcwd(), filename)
-    
     # Export to PNG or HTML based on extension
     try:
         if output_file.lower().endswith('.html'):
@@ -492,16 +687,15 @@ def plot_lightcurve_comparison(lc_files, args):
         print("  pip install kaleido")
         sys.exit(1)
 
-def get_comparison_statistics(lc_files, args):
+def get_comparison_statistics(lc_cache, comparison_values, args):
     """Generate detailed statistics for the comparison."""
     stats = []
     
-    for lc_file in lc_files:
-        lc_data = load_lightcurve_from_text(lc_file)
+    for lc_file, lc_data in lc_cache.items():
         if not lc_data:
             continue
             
-        comparison_value = extract_comparison_value(lc_file, args.compare)
+        comparison_value = comparison_values[lc_file]
         
         # Calculate additional statistics
         rms_var = lc_data['std_rate'] / lc_data['mean_rate'] * 100  # RMS variability in percent
@@ -576,15 +770,23 @@ def main():
             for f in lc_files[:3]:
                 print(f"  - {f}")
     
+    # Load every file once, in parallel; the C parser releases the GIL, so
+    # threads overlap both the disk reads and the parsing
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        lc_cache = dict(zip(lc_files, ex.map(load_lightcurve_from_text, lc_files)))
+    
+    # Parse the compared value out of every path once for stats and plotting
+    comparison_values = extract_comparison_values(lc_files, args.compare)
+    
     # Calculate statistics
-    stats = get_comparison_statistics(lc_files, args)
+    stats = get_comparison_statistics(lc_cache, comparison_values, args)
     
     # Print statistics if requested
     if args.stats:
         print_comparison_statistics(stats, args)
     
     # Create comparison plot
-    plot_lightcurve_comparison(lc_files, args)
+    plot_lightcurve_comparison(lc_cache, comparison_values, args)
 
 if __name__ == "__main__":
     main()
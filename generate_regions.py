@@ -13,6 +13,7 @@ from __future__ import annotations
 import itertools
 import json
 import math
+import os
 import pathlib
 import sys
 
@@ -34,15 +35,28 @@ def annulus_area(rin_arc: float, rout_arc: float) -> float:
     rout_pix = rout_arc / PIX_SCALE
     return math.pi * (rout_pix**2 - rin_pix**2)
 
-def write_ds9(fname: pathlib.Path, region_str: str, color: str) -> None:
-    """Write a DS9 region file (FK5 coordinates)."""
-    content = (
+def ds9_region(region_str: str, color: str) -> str:
+    """Return the contents of a DS9 region file (FK5 coordinates)."""
+    return (
         "# Region file format: DS9 version 4.1\n"
         f"global color={color} width=1\n"
         "fk5\n"
         f"{region_str}\n"
     )
-    fname.write_text(content)
+
+def json_array_item(record: dict) -> bytes:
+    """Encode one record as an element of a JSON array indented by 2 spaces."""
+    return b"  " + json.dumps(record, indent=2).encode().replace(b"\n", b"\n  ")
+
+try:
+    import orjson
+except ImportError:
+    pass
+else:
+    def json_array_item(record: dict) -> bytes:
+        """Encode one record as an element of a JSON array indented by 2 spaces."""
+        # orjson encodes in C even with indentation, unlike json.dumps(indent=2)
+        return b"  " + orjson.dumps(record, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
 
 def main() -> None:
     # Load configurations
@@ -52,54 +66,75 @@ def main() -> None:
     except FileNotFoundError as e:
         sys.exit(f"ERROR: missing config file {e.filename}")
 
-    records: list[dict] = []
+    # Region contents and areas depend only on the radii, so build them once
+    # here instead of again for every event file
+    src_regions = [
+        (f"{r_src:03.0f}", ds9_region(f"circle({SRC_RA},{SRC_DEC},{r_src}\")", color="green"))
+        for r_src in region_cfg["src_radii_arcsec"]
+    ]
+    bkg_regions = [
+        (f"{rin:03.0f}-{rout:03.0f}", ds9_region(f"annulus({SRC_RA},{SRC_DEC},{rin}\",{rout}\")", color="red"))
+        for rin, rout in region_cfg["bkg_annuli_arcsec"]
+    ]
+    src_areas = {r_src: circle_area(r_src) for r_src in region_cfg["src_radii_arcsec"]}
+    combos: list[dict] = []
+    for r_src, (rin, rout) in itertools.product(
+        region_cfg["src_radii_arcsec"],
+        region_cfg["bkg_annuli_arcsec"]
+    ):
+        src_area = src_areas[r_src]
+        bkg_area = annulus_area(rin, rout)
+        combos.append({
+            "r_src_arcsec": r_src,
+            "rin_arcsec": rin,
+            "rout_arcsec": rout,
+            "src_area_pix": round(src_area, 3),
+            "bkg_area_pix": round(bkg_area, 3),
+            "scale_factor": round(src_area / bkg_area, 4),
+        })
 
-    for obs in obs_cfg["observations"]:
-        outdir = pathlib.Path(obs_cfg["outdir_base"]) / f"{obs}_out"
-        if not outdir.is_dir():
-            print(f"⚠️ Skipping {obs}: output dir not found ({outdir})")
-            continue
+    # Stream pixel areas and factors to disk as each event file is handled,
+    # so the records and their JSON text are never all held in memory. They
+    # go to a temp file that replaces pixel_areas.json only once complete,
+    # so a failure partway never clobbers the previous file
+    outpath = pathlib.Path("pixel_areas.json")
+    tmppath = outpath.with_name(outpath.name + ".tmp")
+    n_records = 0
+    try:
+        with tmppath.open("wb") as fh:
+            for obs in obs_cfg["observations"]:
+                outdir = pathlib.Path(obs_cfg["outdir_base"]) / f"{obs}_out"
+                if not outdir.is_dir():
+                    print(f"⚠️ Skipping {obs}: output dir not found ({outdir})")
+                    continue
 
-        # Explicitly handle both detectors A and B
-        for det_tag in ("A01", "B01"):
-            pattern = f"nu*{det_tag}_cl.evt"
-            for evt in sorted(outdir.glob(pattern)):
-                det = det_tag[0]  # 'A' or 'B'
+                # Explicitly handle both detectors A and B
+                for det_tag in ("A01", "B01"):
+                    pattern = f"nu*{det_tag}_cl.evt"
+                    for evt in sorted(outdir.glob(pattern)):
+                        det = det_tag[0]  # 'A' or 'B'
 
-                # 1) Source circle for each radius
-                for r_src in region_cfg["src_radii_arcsec"]:
-                    fname = evt.with_name(f"src_{det}_{r_src:03.0f}.reg")
-                    region = f"circle({SRC_RA},{SRC_DEC},{r_src}\")"
-                    write_ds9(fname, region, color="green")
+                        # 1) Source circle for each radius
+                        for tag, content in src_regions:
+                            evt.with_name(f"src_{det}_{tag}.reg").write_text(content)
 
-                # 2) Background annulus for each (rin,rout)
-                for rin, rout in region_cfg["bkg_annuli_arcsec"]:
-                    fname = evt.with_name(f"bkg_{det}_{rin:03.0f}-{rout:03.0f}.reg")
-                    region = f"annulus({SRC_RA},{SRC_DEC},{rin}\",{rout}\")"
-                    write_ds9(fname, region, color="red")
+                        # 2) Background annulus for each (rin,rout)
+                        for tag, content in bkg_regions:
+                            evt.with_name(f"bkg_{det}_{tag}.reg").write_text(content)
 
-                # 3) Record areas & scale factors for every combo
-                for r_src, (rin, rout) in itertools.product(
-                    region_cfg["src_radii_arcsec"],
-                    region_cfg["bkg_annuli_arcsec"]
-                ):
-                    src_area = circle_area(r_src)
-                    bkg_area = annulus_area(rin, rout)
-                    records.append({
-                        "obsid": obs,
-                        "det": det,
-                        "r_src_arcsec": r_src,
-                        "rin_arcsec": rin,
-                        "rout_arcsec": rout,
-                        "src_area_pix": round(src_area, 3),
-                        "bkg_area_pix": round(bkg_area, 3),
-                        "scale_factor": round(src_area / bkg_area, 4),
-                    })
+                        # 3) Record areas & scale factors for every combo
+                        for combo in combos:
+                            fh.write(b"[\n" if n_records == 0 else b",\n")
+                            fh.write(json_array_item({"obsid": obs, "det": det, **combo}))
+                            n_records += 1
 
-    # Write out pixel areas and factors
-    outpath = pathlib.Path("pixel_areas.json")
-    outpath.write_text(json.dumps(records, indent=2))
-    print(f"✓ Wrote {len(records)} entries to {outpath}")
+            # Close the array; the layout matches json.dumps(records, indent=2)
+            fh.write(b"\n]" if n_records else b"[]")
+    except BaseException:
+        tmppath.unlink(missing_ok=True)
+        raise
+    os.replace(tmppath, outpath)
+    print(f"✓ Wrote {n_records} entries to {outpath}")
 
 if __name__ == "__main__":
     main()
@@ -6,17 +6,115 @@ Usage: python plot_bokeh_lightcurve.py [path_to_lightcurve_file]
 
 import sys
 import os
+import webbrowser
+import functools
+from collections import namedtuple
 import numpy as np
 from astropy.io import fits
 
+try:
+    import fitsio
+except ImportError:
+    fitsio = None
+
 # Bokeh imports
-from bokeh.plotting import figure, save, show
+from bokeh.plotting import figure
 from bokeh.layouts import column, gridplot
 from bokeh.models import (
     ColumnDataSource, HoverTool, Span, Range1d, 
-    Title, LinearAxis, CustomJS, Label, NumeralTickFormatter
+    Title, LinearAxis, CustomJS, Label, NumeralTickFormatter,
+    CustomJSTransform
 )
-from bokeh.io import output_file as bokeh_output_file
+from bokeh.transform import transform
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+
+# Light curves longer than this are bin-averaged down to this many points
+# before being sent to the browser
+MAX_PLOT_POINTS = 4000
+
+LightCurveData = namedtuple('LightCurveData', ['header', 'time', 'rate', 'error'])
+
+@functools.lru_cache(maxsize=8)
+def _load_lc(path, mtime):
+    """
+    Read the primary header and TIME/RATE/ERROR columns of a light curve.
+    
+    mtime is only part of the cache key, so a rewritten file is read again
+    while repeated plots of an unchanged one skip the FITS read.
+    """
+    if fitsio is not None:
+        # CFITSIO reads the columns straight into NumPy buffers
+        with fitsio.FITS(path) as f:
+            primary_header = f[0].read_header()
+            table = f['RATE']
+            print(f"Columns available: {table.get_colnames()}")
+            time, rate, error = table['TIME'][:], table['RATE'][:], table['ERROR'][:]
+    else:
+        # Read the primary header and RATE table directly, without
+        # parsing every HDU of the file
+        primary_header = fits.getheader(path, 0)
+        lc_data = fits.getdata(path, extname='RATE', memmap=True)
+        print(f"Columns available: {lc_data.names}")
+        time, rate, error = lc_data['TIME'], lc_data['RATE'], lc_data['ERROR']
+    
+    # Convert the (possibly big-endian) columns to native float64 once, here,
+    # instead of on every arithmetic pass that follows
+    return LightCurveData(
+        primary_header,
+        np.ascontiguousarray(time, dtype='=f8'),
+        np.ascontiguousarray(rate, dtype='=f8'),
+        np.ascontiguousarray(error, dtype='=f8'),
+    )
+
+def rate_statistics(rate):
+    """Return (mean, std, min, max) of the count rates (all NaN if empty)."""
+    if rate.size == 0:
+        return np.nan, np.nan, np.nan, np.nan
+    return np.mean(rate), np.std(rate), np.min(rate), np.max(rate)
+
+try:
+    from numba import njit
+except ImportError:
+    pass
+else:
+    @njit(cache=True)
+    def rate_statistics(rate):
+        """Return (mean, std, min, max) of the count rates in one pass."""
+        n = rate.shape[0]
+        if n == 0:
+            return np.nan, np.nan, np.nan, np.nan
+        s = 0.0
+        ss = 0.0
+        mn = rate[0]
+        mx = rate[0]
+        for i in range(n):
+            r = rate[i]
+            if np.isnan(r):
+                # Like np.min/np.max, a NaN makes every statistic NaN
+                return np.nan, np.nan, np.nan, np.nan
+            s += r
+            ss += r * r
+            mn = min(mn, r)
+            mx = max(mx, r)
+        mean = s / n
+        return mean, np.sqrt(max(ss / n - mean * mean, 0.0)), mn, mx
+
+def bin_average(n_target, mjd_times, hours, rate, error):
+    """
+    Average adjacent samples of a light curve down to at most n_target points.
+
+    Errors add in quadrature, so each point carries the error of its mean.
+    """
+    stride = -(-len(rate) // n_target)  # ceiling division
+    starts = np.arange(0, len(rate), stride)
+    counts = np.diff(np.append(starts, len(rate)))
+    
+    def block_mean(a):
+        return np.add.reduceat(a, starts) / counts
+    
+    binned_error = np.sqrt(np.add.reduceat(error * error, starts)) / counts
+    return block_mean(mjd_times), block_mean(hours), block_mean(rate), binned_error
 
 def plot_lightcurve(lc_file):
     """
@@ -33,67 +131,62 @@ def plot_lightcurve(lc_file):
         return
         
     try:
-        # Open the FITS file
-        with fits.open(lc_file) as hdul:
-            print(f"FITS extensions available: {[ext.name for ext in hdul]}")
-            
-            # Get metadata from primary header
-            primary_header = hdul[0].header
-            obsid = primary_header.get('OBS_ID', 'Unknown')
-            target = primary_header.get('OBJECT', 'Unknown')
-            instrument = primary_header.get('INSTRUME', 'NuSTAR')
-            exposure = primary_header.get('EXPOSURE', 0)
-            bin_size = primary_header.get('TIMEDEL', 0)
-            tstart = primary_header.get('TSTART', 0)
-            tstop = primary_header.get('TSTOP', 0)
-            
-            # MJD reference from header (NuSTAR specific)
-            mjdrefi = primary_header.get('MJDREFI', 0)
-            mjdreff = primary_header.get('MJDREFF', 0)
-            mjdref = mjdrefi + mjdreff
-            
-            date_obs = primary_header.get('DATE-OBS', '')
-            
-            print(f"Target: {target}, ObsID: {obsid}")
-            print(f"Exposure: {exposure} s, Bin size: {bin_size} s")
-            print(f"Observation start: {date_obs}")
-            print(f"MJD reference: {mjdref}")
-            
-            # Get data from the RATE extension
-            lc_data = hdul['RATE'].data
-            print(f"Columns available: {lc_data.names}")
-            
-            # Extract key information
-            time = lc_data['TIME']
-            rate = lc_data['RATE']
-            error = lc_data['ERROR']
-            
-            # Filter out NaN values
-            valid_mask = ~np.isnan(rate)
-            if not np.all(valid_mask):
-                print(f"Warning: Found {np.sum(~valid_mask)} NaN values in rate data. Filtering them out.")
+        # Read (or reuse the cached) header and columns
+        lc = _load_lc(lc_file, os.path.getmtime(lc_file))
+        primary_header = lc.header
+        obsid = primary_header.get('OBS_ID', 'Unknown')
+        target = primary_header.get('OBJECT', 'Unknown')
+        instrument = primary_header.get('INSTRUME', 'NuSTAR')
+        exposure = primary_header.get('EXPOSURE', 0)
+        bin_size = primary_header.get('TIMEDEL', 0)
+        tstart = primary_header.get('TSTART', 0)
+        tstop = primary_header.get('TSTOP', 0)
+        
+        # MJD reference from header (NuSTAR specific)
+        mjdrefi = primary_header.get('MJDREFI', 0)
+        mjdreff = primary_header.get('MJDREFF', 0)
+        mjdref = mjdrefi + mjdreff
+        
+        date_obs = primary_header.get('DATE-OBS', '')
+        
+        print(f"Target: {target}, ObsID: {obsid}")
+        print(f"Exposure: {exposure} s, Bin size: {bin_size} s")
+        print(f"Observation start: {date_obs}")
+        print(f"MJD reference: {mjdref}")
+        
+        # Extract key information
+        time, rate, error = lc.time, lc.rate, lc.error
+        
+        # Filter out NaN values. A finite sum means every rate is finite, so
+        # the mask is only built when there is something to filter
+        if not np.isfinite(rate.sum()):
+            valid_mask = np.isfinite(rate)
+            n_invalid = valid_mask.size - np.count_nonzero(valid_mask)
+            if n_invalid:
+                print(f"Warning: Found {n_invalid} NaN values in rate data. Filtering them out.")
                 time = time[valid_mask]
                 rate = rate[valid_mask]
                 error = error[valid_mask]
-            
-            # Check if we have any valid data left
-            if len(time) == 0:
-                print("Error: No valid data points after filtering NaN values.")
-                return
-            
-            # Convert mission time to MJD
-            mjd_times = mjdref + (time / 86400.0)  # Convert seconds to days
-            
-            # Calculate hours from start
-            if len(time) > 0:
-                time_offset = time - time[0]  # seconds from start
-                time_hours = time_offset / 3600.0  # convert to hours
-            else:
-                time_hours = np.array([])
-            
-            print(f"Time range (MJD): {mjd_times[0]:.6f} - {mjd_times[-1]:.6f}")
-            print(f"Time range (hours): 0.0 - {time_hours[-1]:.3f}")
-                
+        
+        # Check if we have any valid data left
+        if len(time) == 0:
+            print("Error: No valid data points after filtering NaN values.")
+            return
+        
+        # Convert mission time to MJD and to hours from start, each as one
+        # scaling pass into its own buffer followed by an in-place offset
+        mjd_times = np.empty(len(time))
+        time_hours = np.empty(len(time))
+        np.multiply(time, 1.0 / 86400.0, out=mjd_times)  # Convert seconds to days
+        mjd_times += mjdref
+        
+        if len(time) > 0:
+            np.subtract(time, time[0], out=time_hours)  # seconds from start
+            time_hours *= 1.0 / 3600.0  # convert to hours
+        
+        print(f"Time range (MJD): {mjd_times[0]:.6f} - {mjd_times[-1]:.6f}")
+        print(f"Time range (hours): 0.0 - {time_hours[-1]:.3f}")
+        
     except Exception as e:
         print(f"Error reading FITS file: {e}")
         import traceback
@@ -101,25 +194,42 @@ def plot_lightcurve(lc_file):
         return
     
     # Calculate basic statistics
-    mean_rate = np.mean(rate)
-    std_rate = np.std(rate)
-    max_rate = np.max(rate)
-    min_rate = np.min(rate)
+    mean_rate, std_rate, min_rate, max_rate = rate_statistics(rate)
     
     print(f"Mean count rate: {mean_rate:.3f} cts/s")
     print(f"Std deviation: {std_rate:.3f} cts/s")
     print(f"Range: {min_rate:.3f} - {max_rate:.3f} cts/s")
     
-    # Prepare data for Bokeh
+    # Bin-average long light curves for plotting (statistics above use all
+    # points). Means keep the scatter centred where the data are, unlike
+    # picking extreme points per bucket
+    if len(rate) > MAX_PLOT_POINTS:
+        n_points = len(rate)
+        mjd_times, time_hours, rate, error = bin_average(
+            MAX_PLOT_POINTS, mjd_times, time_hours, rate, error)
+        print(f"Plotting {len(rate)} bin averages of the light curve's {n_points} points")
+    
+    # Prepare data for Bokeh. Every column is shipped to the browser, so all
+    # but MJD go as float32; MJD keeps float64 for its 5-decimal precision.
+    # Contiguous native ndarrays are serialized as binary buffers, not JSON lists
     source = ColumnDataSource(data={
-        'mjd': mjd_times,
-        'hours': time_hours,
-        'rate': rate,
-        'error': error,
-        'upper': rate + error,
-        'lower': rate - error,
+        'mjd': np.ascontiguousarray(mjd_times, dtype=np.float64),
+        'hours': np.ascontiguousarray(time_hours, dtype=np.float32),
+        'rate': np.ascontiguousarray(rate, dtype=np.float32),
+        'error': np.ascontiguousarray(error, dtype=np.float32),
     })
     
+    # Error bar ends are derived from rate and error in the browser rather
+    # than sent as two more full-length columns
+    to_upper = CustomJSTransform(args=dict(source=source), v_func="""
+        const error = source.data.error;
+        return xs.map((x, i) => x + error[i]);
+    """)
+    to_lower = CustomJSTransform(args=dict(source=source), v_func="""
+        const error = source.data.error;
+        return xs.map((x, i) => x - error[i]);
+    """)
+    
     # Extract source and background info from filename
     filename = os.path.basename(lc_file)
     if "src" in filename and "bkg" in filename:
@@ -151,7 +261,7 @@ def plot_lightcurve(lc_file):
     p_mjd.add_tools(hover)
     
     # Add error bars (use segments for vertical lines)
-    p_mjd.segment(x0='mjd', y0='lower', x1='mjd', y1='upper', source=source, 
+    p_mjd.segment(x0='mjd', y0=transform('rate', to_lower), x1='mjd', y1=transform('rate', to_upper), source=source, 
                   color='lightblue', line_width=1)
     
     # Add the data points (using scatter instead of circle due to deprecation warning)
@@ -219,7 +329,7 @@ def plot_lightcurve(lc_file):
     
     # Set initial range for hours plot
     p_hours.x_range.start = 0
-    p_hours.x_range.end = max(time_hours)
+    p_hours.x_range.end = float(time_hours[-1])  # time is sorted, so the last hour is the max
     
     # Initialize MJD plot range
     p_mjd.x_range.start = mjd_times[0]
@@ -228,14 +338,16 @@ def plot_lightcurve(lc_file):
     # Arrange the plots
     layout = column(p_mjd, p_hours)
     
-    # Save the plot - fixed the naming conflict here
+    # Serialize the document once, write it, and open that same file in the
+    # browser rather than having show() template it a second time
     html_output_file = os.path.splitext(lc_file)[0] + '_bokeh.html'
-    bokeh_output_file(html_output_file)
-    save(layout)
+    html = file_html(layout, CDN, f"{target} (ObsID: {obsid})")
+    with open(html_output_file, 'w') as f:
+        f.write(html)
     print(f"Interactive plot saved to: {html_output_file}")
     
     # Also show in browser
-    show(layout)
+    webbrowser.open('file://' + os.path.abspath(html_output_file))
 
 if __name__ == "__main__":
     # Use the command-line argument if provided, otherwise use the default file
@@ -7,21 +7,108 @@ Usage: python plot_holoviews_lightcurve.py [path_to_lightcurve_file]
 
 import sys
 import os
+import functools
+from collections import namedtuple
 import numpy as np
-import pandas as pd  # Using pandas is often convenient with HoloViews
 from astropy.io import fits
 
+try:
+    import fitsio
+except ImportError:
+    fitsio = None
+
 # HoloViews / Datashader imports
 import holoviews as hv
+import datashader as ds
 from holoviews.operation.datashader import rasterize
-hv.extension('bokeh') # Set the backend to Bokeh
 
 # Bokeh imports for specific customizations (hooks, models)
 from bokeh.models import (
     HoverTool, Span, Range1d, Title, LinearAxis, CustomJS, Label, NumeralTickFormatter
 )
-# No need for figure, save, show, ColumnDataSource from bokeh.plotting
-# No need for bokeh_output_file from bokeh.io
+from bokeh.io import save, show, output_file as bokeh_output_file
+# No need for figure, ColumnDataSource from bokeh.plotting
+
+LightCurveData = namedtuple('LightCurveData', ['header', 'time', 'rate', 'error'])
+
+@functools.lru_cache(maxsize=8)
+def _load_lc(path, mtime):
+    """
+    Read the primary header and TIME/RATE/ERROR columns of a light curve.
+
+    mtime is only part of the cache key, so a rewritten file is read again
+    while repeated plots of an unchanged one skip the FITS read.
+    """
+    if fitsio is not None:
+        # CFITSIO reads the columns straight into NumPy buffers
+        with fitsio.FITS(path) as f:
+            primary_header = f[0].read_header()
+            table = f['RATE']
+            print(f"Columns available: {table.get_colnames()}")
+            time, rate, error = table['TIME'][:], table['RATE'][:], table['ERROR'][:]
+    else:
+        # Read the primary header and RATE table directly, without
+        # parsing every HDU of the file
+        primary_header = fits.getheader(path, 0)
+        lc_data = fits.getdata(path, extname='RATE', memmap=True)
+        print(f"Columns available: {lc_data.names}")
+        time, rate, error = lc_data['TIME'], lc_data['RATE'], lc_data['ERROR']
+    
+    # Convert the (possibly big-endian) columns to native float64 once, here,
+    # instead of on every arithmetic pass that follows
+    return LightCurveData(
+        primary_header,
+        np.ascontiguousarray(time, dtype='=f8'),
+        np.ascontiguousarray(rate, dtype='=f8'),
+        np.ascontiguousarray(error, dtype='=f8'),
+    )
+
+def rate_statistics(rate):
+    """Return (mean, std, min, max) of the count rates (all NaN if empty)."""
+    if rate.size == 0:
+        return np.nan, np.nan, np.nan, np.nan
+    return np.mean(rate), np.std(rate), np.min(rate), np.max(rate)
+
+def error_bounds(rate, error, upper, lower):
+    """Write rate + error into upper and rate - error into lower."""
+    np.add(rate, error, out=upper)
+    np.subtract(rate, error, out=lower)
+
+try:
+    from numba import njit, prange
+except ImportError:
+    pass
+else:
+    @njit(cache=True)
+    def rate_statistics(rate):
+        """Return (mean, std, min, max) of the count rates in one pass."""
+        n = rate.shape[0]
+        if n == 0:
+            return np.nan, np.nan, np.nan, np.nan
+        s = 0.0
+        ss = 0.0
+        mn = rate[0]
+        mx = rate[0]
+        for i in range(n):
+            r = rate[i]
+            if np.isnan(r):
+                # Like np.min/np.max, a NaN makes every statistic NaN
+                return np.nan, np.nan, np.nan, np.nan
+            s += r
+            ss += r * r
+            mn = min(mn, r)
+            mx = max(mx, r)
+        mean = s / n
+        return mean, np.sqrt(max(ss / n - mean * mean, 0.0)), mn, mx
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def error_bounds(rate, error, upper, lower):
+        """Write rate + error into upper and rate - error into lower in one sweep."""
+        for i in prange(rate.shape[0]):
+            r = rate[i]
+            e = error[i]
+            upper[i] = r + e
+            lower[i] = r - e
 
 def plot_lightcurve_hv(lc_file):
     """
@@ -38,66 +125,63 @@ def plot_lightcurve_hv(lc_file):
         return
 
     try:
-        # Open the FITS file
-        with fits.open(lc_file) as hdul:
-            print(f"FITS extensions available: {[ext.name for ext in hdul]}")
-
-            # Get metadata from primary header
-            primary_header = hdul[0].header
-            obsid = primary_header.get('OBS_ID', 'Unknown')
-            target = primary_header.get('OBJECT', 'Unknown')
-            instrument = primary_header.get('INSTRUME', 'NuSTAR')
-            exposure = primary_header.get('EXPOSURE', 0)
-            bin_size = primary_header.get('TIMEDEL', 0)
-            tstart = primary_header.get('TSTART', 0)
-            tstop = primary_header.get('TSTOP', 0)
-
-            # MJD reference from header (NuSTAR specific)
-            mjdrefi = primary_header.get('MJDREFI', 0)
-            mjdreff = primary_header.get('MJDREFF', 0)
-            mjdref = mjdrefi + mjdreff
-
-            date_obs = primary_header.get('DATE-OBS', '')
-
-            print(f"Target: {target}, ObsID: {obsid}")
-            print(f"Exposure: {exposure} s, Bin size: {bin_size} s")
-            print(f"Observation start: {date_obs}")
-            print(f"MJD reference: {mjdref}")
-
-            # Get data from the RATE extension
-            lc_data = hdul['RATE'].data
-            print(f"Columns available: {lc_data.names}")
-
-            # Extract key information
-            time = lc_data['TIME']
-            rate = lc_data['RATE']
-            error = lc_data['ERROR']
-
-            # Filter out NaN values
-            valid_mask = ~np.isnan(rate) & ~np.isnan(time) & ~np.isnan(error) # Ensure all are valid
-            if not np.all(valid_mask):
-                print(f"Warning: Found {np.sum(~valid_mask)} NaN values in data. Filtering them out.")
+        # Read (or reuse the cached) header and columns
+        lc = _load_lc(lc_file, os.path.getmtime(lc_file))
+        primary_header = lc.header
+        obsid = primary_header.get('OBS_ID', 'Unknown')
+        target = primary_header.get('OBJECT', 'Unknown')
+        instrument = primary_header.get('INSTRUME', 'NuSTAR')
+        exposure = primary_header.get('EXPOSURE', 0)
+        bin_size = primary_header.get('TIMEDEL', 0)
+        tstart = primary_header.get('TSTART', 0)
+        tstop = primary_header.get('TSTOP', 0)
+
+        # MJD reference from header (NuSTAR specific)
+        mjdrefi = primary_header.get('MJDREFI', 0)
+        mjdreff = primary_header.get('MJDREFF', 0)
+        mjdref = mjdrefi + mjdreff
+
+        date_obs = primary_header.get('DATE-OBS', '')
+
+        print(f"Target: {target}, ObsID: {obsid}")
+        print(f"Exposure: {exposure} s, Bin size: {bin_size} s")
+        print(f"Observation start: {date_obs}")
+        print(f"MJD reference: {mjdref}")
+
+        # Extract key information
+        time, rate, error = lc.time, lc.rate, lc.error
+
+        # Filter out NaN values. Finite sums mean every value is finite, so
+        # the mask is only built when there is something to filter
+        if not np.isfinite(rate.sum() + time.sum() + error.sum()):
+            valid_mask = np.isfinite(rate) # Ensure all are valid, combining in place
+            np.logical_and(valid_mask, np.isfinite(time), out=valid_mask)
+            np.logical_and(valid_mask, np.isfinite(error), out=valid_mask)
+            n_invalid = valid_mask.size - np.count_nonzero(valid_mask)
+            if n_invalid:
+                print(f"Warning: Found {n_invalid} NaN values in data. Filtering them out.")
                 time = time[valid_mask]
                 rate = rate[valid_mask]
                 error = error[valid_mask]
 
-            # Check if we have any valid data left
-            if len(time) == 0:
-                print("Error: No valid data points after filtering NaN values.")
-                return
+        # Check if we have any valid data left
+        if len(time) == 0:
+            print("Error: No valid data points after filtering NaN values.")
+            return
 
-            # Convert mission time to MJD
-            mjd_times = mjdref + (time / 86400.0)  # Convert seconds to days
+        # Convert mission time to MJD and to hours from start, each as one
+        # scaling pass into its own buffer followed by an in-place offset
+        mjd_times = np.empty(len(time))
+        time_hours = np.empty(len(time))
+        np.multiply(time, 1.0 / 86400.0, out=mjd_times)  # Convert seconds to days
+        mjd_times += mjdref
 
-            # Calculate hours from start
-            if len(time) > 0:
-                time_offset = time - time[0]  # seconds from start
-                time_hours = time_offset / 3600.0  # convert to hours
-            else:
-                time_hours = np.array([])
+        if len(time) > 0:
+            np.subtract(time, time[0], out=time_hours)  # seconds from start
+            time_hours *= 1.0 / 3600.0  # convert to hours
 
-            print(f"Time range (MJD): {mjd_times[0]:.6f} - {mjd_times[-1]:.6f}")
-            print(f"Time range (hours): 0.0 - {time_hours[-1]:.3f}")
+        print(f"Time range (MJD): {mjd_times[0]:.6f} - {mjd_times[-1]:.6f}")
+        print(f"Time range (hours): 0.0 - {time_hours[-1]:.3f}")
 
     except Exception as e:
         print(f"Error reading FITS file: {e}")
@@ -106,24 +190,29 @@ def plot_lightcurve_hv(lc_file):
         return
 
     # Calculate basic statistics
-    mean_rate = np.mean(rate)
-    std_rate = np.std(rate)
-    max_rate = np.max(rate)
-    min_rate = np.min(rate)
+    mean_rate, std_rate, min_rate, max_rate = rate_statistics(rate)
 
     print(f"Mean count rate: {mean_rate:.3f} cts/s")
     print(f"Std deviation: {std_rate:.3f} cts/s")
     print(f"Range: {min_rate:.3f} - {max_rate:.3f} cts/s")
 
-    # Prepare data for HoloViews (using Pandas DataFrame)
-    df = pd.DataFrame({
+    # Prepare data for HoloViews as a plain dict of arrays; HoloViews takes
+    # it as-is, with no DataFrame copy or index. Values other than MJD are
+    # float32, which is ample for plotting and halves their size
+    rate32 = rate.astype(np.float32, copy=False)
+    error32 = error.astype(np.float32, copy=False)
+    data = {
         'mjd': mjd_times,
-        'hours': time_hours,
-        'rate': rate,
-        'error': error,
-        'upper': rate + error,
-        'lower': rate - error,
-    })
+        'hours': time_hours.astype(np.float32, copy=False),
+        'rate': rate32,
+        'error': error32,
+    }
+    
+    # Error bar ends, written once into their own buffers; only the error
+    # segments need them, so they are not duplicated in data as well
+    upper = np.empty_like(rate32)
+    lower = np.empty_like(rate32)
+    error_bounds(rate32, error32, upper, lower)
 
     # Extract source and background info from filename
     filename = os.path.basename(lc_file)
@@ -134,6 +223,11 @@ def plot_lightcurve_hv(lc_file):
 
     # --- HoloViews Plotting ---
 
+    # Set the backend to Bokeh on first use only, rather than at import;
+    # hv.extension re-registers its renderers every time it is called
+    if 'bokeh' not in hv.Store.renderers:
+        hv.extension('bokeh')
+
     # Define tooltips for HoverTool
     tooltips = [
         ("MJD", "@mjd{0.00000}"),
@@ -145,28 +239,24 @@ def plot_lightcurve_hv(lc_file):
 
     # Create HoloViews elements
     # Points element - kdims define position (x, y), vdims define associated values
-    points = hv.Points(df, kdims=['mjd', 'rate'], vdims=['error', 'hours']).opts( # <--- CORRECTED LINE
+    points = hv.Points(data, kdims=['mjd', 'rate'], vdims=['error', 'hours']).opts( # <--- CORRECTED LINE
         tools=[hover], # Attach hover tool here
         # alpha=0.7 # Alpha controlled by rasterize
         # size=5    # Size controlled by rasterize/pixel density
     )
 
-    # Error bars element (as Segments for rasterization)
-    # Create a DataFrame suitable for hv.Segments
-    error_df = pd.DataFrame({
-        'mjd0': df['mjd'], 'mjd1': df['mjd'],
-        'lower': df['lower'], 'upper': df['upper']
-    })
-    error_segments = hv.Segments(error_df, kdims=['mjd0', 'lower', 'mjd1', 'upper']).opts(
-        color='lightblue',
-        line_width=1 # This might have less effect after rasterization
+    # Error bars element, as one lower/upper envelope area. Rasterizing it
+    # fills each pixel column once instead of drawing a line per point
+    error_envelope = hv.Area(
+        {'mjd': mjd_times, 'lower': lower, 'upper': upper},
+        kdims='mjd', vdims=['lower', 'upper']
     )
 
     # Rasterize the points and error bars
     # Adjust width/height to match desired plot dimensions
     # cmap can be a single color or a colormap if aggregating
     rasterized_points = rasterize(points, cmap='blue', width=900, height=500, cnorm='linear', aggregator=ds.mean('rate'))
-    rasterized_errors = rasterize(error_segments, cmap='lightblue', width=900, height=500)
+    rasterized_errors = rasterize(error_envelope, cmap='lightblue', width=900, height=500, aggregator=ds.any())
 
     # Horizontal line for the mean rate
     mean_line_hv = hv.HLine(mean_rate).opts(
@@ -184,15 +274,15 @@ def plot_lightcurve_hv(lc_file):
     # Define a hook function for Bokeh customizations HoloViews doesn't handle directly
     def customize_bokeh_fig(plot, element):
         fig = plot.state # Get the underlying Bokeh figure
-        mjd_start = df['mjd'].iloc[0]
-        mean_rate_val = df['rate'].mean() # Recalculate or ensure available
+        mjd_start = mjd_times[0]
+        mean_rate_val = mean_rate
 
         # 1. Format main MJD axis (primary x-axis)
         fig.xaxis[0].formatter = NumeralTickFormatter(format="0.00000")
 
         # 2. Add secondary 'hours' x-axis below the main plot
         # Create a new range for the hours axis
-        hours_range = Range1d(start=0, end=max(df['hours']))
+        hours_range = Range1d(start=0, end=float(time_hours[-1]))
         fig.extra_x_ranges = {"hours_range": hours_range}
 
         # Create the hours axis, linking it to the new range
@@ -230,8 +320,8 @@ def plot_lightcurve_hv(lc_file):
         fig.add_layout(mean_label)
 
         # 5. Set initial MJD range (optional, HoloViews usually sets this automatically)
-        # fig.x_range.start = df['mjd'].iloc[0]
-        # fig.x_range.end = df['mjd'].iloc[-1]
+        # fig.x_range.start = mjd_times[0]
+        # fig.x_range.end = mjd_times[-1]
 
         # 6. Trigger initial calculation for hours axis range based on initial MJD range
         # This ensures the hours axis shows the correct initial range
@@ -250,21 +340,17 @@ def plot_lightcurve_hv(lc_file):
         show_grid=True,
         hooks=[customize_bokeh_fig], # Apply the customization hook
         # Set initial x-limits (optional, HoloViews usually infers this)
-        # xlim=(df['mjd'].iloc[0], df['mjd'].iloc[-1])
+        # xlim=(mjd_times[0], mjd_times[-1])
     )
 
-    # Save the plot using HoloViews saver
+    # Render the HoloViews object to a Bokeh model once, and reuse it for
+    # both the saved HTML and the browser view
+    rendered = hv.render(final_hv_plot, backend='bokeh')
     html_output_file = os.path.splitext(lc_file)[0] + '_holoviews_bokeh.html'
     print(f"Saving interactive plot to: {html_output_file}")
-    hv.save(final_hv_plot, html_output_file, backend='bokeh')
-
-    # To display the plot in a browser or notebook when running the script:
-    # show(final_hv_plot) # Need to import show from bokeh.io for this standalone script
-    # Or just rely on hv.save opening it if the environment supports it.
-    # For standalone scripts, explicitly using bokeh.io.show might be needed.
-    from bokeh.io import show
-    show(hv.render(final_hv_plot)) # Render HoloViews object to Bokeh model first
-
+    bokeh_output_file(html_output_file)
+    save(rendered)
+    show(rendered)
 
 if __name__ == "__main__":
     # Use the command-line argument if provided, otherwise use the default file
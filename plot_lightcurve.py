@@ -1,19 +1,95 @@
 #!/usr/bin/env python3
 """
 Script to plot NuSTAR light curve data from a FITS file.
-Usage: python plot_lightcurve.py [path_to_lightcurve_file]
+Usage: python plot_lightcurve.py [path_to_lightcurve_file] [--interactive]
 """
 
 import sys
 import os
+import functools
+from collections import namedtuple
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 from astropy.io import fits
+
+try:
+    import fitsio
+except ImportError:
+    fitsio = None
 from astropy.time import Time
 import matplotlib.dates as mdates
-from matplotlib.ticker import FuncFormatter
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+from matplotlib.collections import LineCollection
+
+LightCurveData = namedtuple('LightCurveData', ['header', 'time', 'rate', 'error'])
+
+@functools.lru_cache(maxsize=8)
+def _load_lc(path, mtime):
+    """
+    Read the primary header and TIME/RATE/ERROR columns of a light curve.
+    
+    mtime is only part of the cache key, so a rewritten file is read again
+    while repeated plots of an unchanged one skip the FITS read.
+    """
+    if fitsio is not None:
+        # CFITSIO reads the columns straight into NumPy buffers
+        with fitsio.FITS(path) as f:
+            primary_header = f[0].read_header()
+            table = f['RATE']
+            print(f"Columns available: {table.get_colnames()}")
+            time, rate, error = table['TIME'][:], table['RATE'][:], table['ERROR'][:]
+    else:
+        # Read the primary header and RATE table directly, without
+        # parsing every HDU of the file
+        primary_header = fits.getheader(path, 0)
+        lc_data = fits.getdata(path, extname='RATE', memmap=True)
+        print(f"Columns available: {lc_data.names}")
+        time, rate, error = lc_data['TIME'], lc_data['RATE'], lc_data['ERROR']
+    
+    # Convert the (possibly big-endian) columns to native float64 once, here,
+    # instead of on every arithmetic pass that follows
+    return LightCurveData(
+        primary_header,
+        np.ascontiguousarray(time, dtype='=f8'),
+        np.ascontiguousarray(rate, dtype='=f8'),
+        np.ascontiguousarray(error, dtype='=f8'),
+    )
+
+def rate_statistics(rate):
+    """Return (mean, std, min, max) of the count rates (all NaN if empty)."""
+    if rate.size == 0:
+        return np.nan, np.nan, np.nan, np.nan
+    return np.mean(rate), np.std(rate), np.min(rate), np.max(rate)
+
+try:
+    from numba import njit
+except ImportError:
+    pass
+else:
+    @njit(cache=True)
+    def rate_statistics(rate):
+        """Return (mean, std, min, max) of the count rates in one pass."""
+        n = rate.shape[0]
+        if n == 0:
+            return np.nan, np.nan, np.nan, np.nan
+        s = 0.0
+        ss = 0.0
+        mn = rate[0]
+        mx = rate[0]
+        for i in range(n):
+            r = rate[i]
+            if np.isnan(r):
+                # Like np.min/np.max, a NaN makes every statistic NaN
+                return np.nan, np.nan, np.nan, np.nan
+            s += r
+            ss += r * r
+            mn = min(mn, r)
+            mx = max(mx, r)
+        mean = s / n
+        return mean, np.sqrt(max(ss / n - mean * mean, 0.0)), mn, mx
 
-def plot_lightcurve(lc_file):
+def plot_lightcurve(lc_file, interactive=False):
     """
     Plot a NuSTAR light curve from a FITS file.
     
@@ -21,6 +97,8 @@ def plot_lightcurve(lc_file):
     -----------
     lc_file : str
         Path to the light curve FITS file
+    interactive : bool
+        Show the plot in a window after saving it
     """
     # Check if file exists
     if not os.path.exists(lc_file):
@@ -28,54 +106,46 @@ def plot_lightcurve(lc_file):
         return
         
     try:
-        # Open the FITS file
-        with fits.open(lc_file) as hdul:
-            print(f"FITS extensions available: {[ext.name for ext in hdul]}")
-            
-            # Get metadata from primary header
-            primary_header = hdul[0].header
-            obsid = primary_header.get('OBS_ID', 'Unknown')
-            target = primary_header.get('OBJECT', 'Unknown')
-            instrument = primary_header.get('INSTRUME', 'NuSTAR')
-            exposure = primary_header.get('EXPOSURE', 0)
-            bin_size = primary_header.get('TIMEDEL', 0)
-            tstart = primary_header.get('TSTART', 0)
-            tstop = primary_header.get('TSTOP', 0)
-            
-            # MJD reference from header (NuSTAR specific)
-            mjdrefi = primary_header.get('MJDREFI', 0)
-            mjdreff = primary_header.get('MJDREFF', 0)
-            mjdref = mjdrefi + mjdreff
-            
-            date_obs = primary_header.get('DATE-OBS', '')
-            
-            print(f"Target: {target}, ObsID: {obsid}")
-            print(f"Exposure: {exposure} s, Bin size: {bin_size} s")
-            print(f"Observation start: {date_obs}")
-            print(f"MJD reference: {mjdref}")
-            
-            # Get data from the RATE extension
-            lc_data = hdul['RATE'].data
-            print(f"Columns available: {lc_data.names}")
-            
-            # Extract key information
-            time = lc_data['TIME']
-            rate = lc_data['RATE']
-            error = lc_data['ERROR']
-            
-            # Convert mission time to MJD
-            mjd_times = mjdref + (time / 86400.0)  # Convert seconds to days
-            
-            # Calculate hours from start
-            if len(time) > 0:
-                time_offset = time - time[0]  # seconds from start
-                time_hours = time_offset / 3600.0  # convert to hours
-            else:
-                time_hours = np.array([])
-            
-            print(f"Time range (MJD): {mjd_times[0]:.6f} - {mjd_times[-1]:.6f}")
-            print(f"Time range (hours): 0.0 - {time_hours[-1]:.3f}")
-                
+        # Read (or reuse the cached) header and columns
+        lc = _load_lc(lc_file, os.path.getmtime(lc_file))
+        primary_header = lc.header
+        obsid = primary_header.get('OBS_ID', 'Unknown')
+        target = primary_header.get('OBJECT', 'Unknown')
+        instrument = primary_header.get('INSTRUME', 'NuSTAR')
+        exposure = primary_header.get('EXPOSURE', 0)
+        bin_size = primary_header.get('TIMEDEL', 0)
+        tstart = primary_header.get('TSTART', 0)
+        tstop = primary_header.get('TSTOP', 0)
+        
+        # MJD reference from header (NuSTAR specific)
+        mjdrefi = primary_header.get('MJDREFI', 0)
+        mjdreff = primary_header.get('MJDREFF', 0)
+        mjdref = mjdrefi + mjdreff
+        
+        date_obs = primary_header.get('DATE-OBS', '')
+        
+        print(f"Target: {target}, ObsID: {obsid}")
+        print(f"Exposure: {exposure} s, Bin size: {bin_size} s")
+        print(f"Observation start: {date_obs}")
+        print(f"MJD reference: {mjdref}")
+        
+        # Extract key information
+        time, rate, error = lc.time, lc.rate, lc.error
+        
+        # Convert mission time to MJD and to hours from start, each as one
+        # scaling pass into its own buffer followed by an in-place offset
+        mjd_times = np.empty(len(time))
+        time_hours = np.empty(len(time))
+        np.multiply(time, 1.0 / 86400.0, out=mjd_times)  # Convert seconds to days
+        mjd_times += mjdref
+        
+        if len(time) > 0:
+            np.subtract(time, time[0], out=time_hours)  # seconds from start
+            time_hours *= 1.0 / 3600.0  # convert to hours
+        
+        print(f"Time range (MJD): {mjd_times[0]:.6f} - {mjd_times[-1]:.6f}")
+        print(f"Time range (hours): 0.0 - {time_hours[-1]:.3f}")
+        
     except Exception as e:
         print(f"Error reading FITS file: {e}")
         import traceback
@@ -83,10 +153,7 @@ def plot_lightcurve(lc_file):
         return
     
     # Calculate basic statistics
-    mean_rate = np.mean(rate)
-    std_rate = np.std(rate)
-    max_rate = np.max(rate)
-    min_rate = np.min(rate)
+    mean_rate, std_rate, min_rate, max_rate = rate_statistics(rate)
     
     print(f"Mean count rate: {mean_rate:.3f} cts/s")
     print(f"Std deviation: {std_rate:.3f} cts/s")
@@ -95,9 +162,16 @@ def plot_lightcurve(lc_file):
     # Create the plot
     fig, ax = plt.subplots(figsize=(12, 6))
     
-    # Plot light curve with error bars using MJD for x-axis
-    ax.errorbar(mjd_times, rate, yerr=error, fmt='o', markersize=3, 
-                color='blue', ecolor='lightblue', capsize=0, alpha=0.7)
+    # Plot light curve with error bars using MJD for x-axis. All error bars
+    # form one LineCollection and all markers one scatter, rather than the
+    # per-point artists errorbar() builds
+    segments = np.empty((len(mjd_times), 2, 2))
+    segments[:, :, 0] = mjd_times[:, None]
+    segments[:, 0, 1] = rate - error
+    segments[:, 1, 1] = rate + error
+    ax.add_collection(LineCollection(segments, colors='lightblue', linewidths=1, alpha=0.7))
+    ax.scatter(mjd_times, rate, s=9, c='blue', alpha=0.7)
+    ax.autoscale_view()
     
     # Add horizontal line at mean rate
     ax.axhline(y=mean_rate, color='red', linestyle='-', alpha=0.7, label=f'Mean: {mean_rate:.2f} cts/s')
@@ -116,12 +190,8 @@ def plot_lightcurve(lc_file):
         # For very short observations, show more precision
         plt.xticks(rotation=45)
     else:
-        # For longer observations, calculate appropriate tick spacing
-        tick_spacing = duration_days / 6  # Aim for ~6 ticks
-        tick_start = np.floor(mjd_times[0] / tick_spacing) * tick_spacing
-        tick_end = np.ceil(mjd_times[-1] / tick_spacing) * tick_spacing
-        ticks = np.arange(tick_start, tick_end + tick_spacing, tick_spacing)
-        ax.set_xticks(ticks)
+        # For longer observations, let Matplotlib pick ~6 round-valued ticks
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=6))
         plt.xticks(rotation=45)
     
     # Create a secondary x-axis for hours from start
@@ -162,14 +232,23 @@ def plot_lightcurve(lc_file):
     print(f"Plot saved to: {output_file}")
     
     # Show the plot
-    plt.show()
+    if interactive:
+        plt.show()
 
 if __name__ == "__main__":
+    # Only pay for a GUI backend when the plot will be shown; otherwise render
+    # straight to PNG with Agg. Done here rather than at import so importers
+    # keep their own backend.
+    interactive = '--interactive' in sys.argv
+    if not interactive:
+        matplotlib.use('Agg')
+    
     # Use the command-line argument if provided, otherwise use the default file
-    if len(sys.argv) > 1:
-        lc_file = sys.argv[1]
+    args = [arg for arg in sys.argv[1:] if arg != '--interactive']
+    if args:
+        lc_file = args[0]
     else:
         # Default file path
         lc_file = "/media/kartikmandar/HDD/Cygnusx1_lightcurves/lightcurves/30001011009/src015_bkg050-080_bin0.1/final_LC_src15_bkg50-80.lc"
     
-    plot_lightcurve(lc_file)
\ No newline at end of file
+    plot_lightcurve(lc_file, interactive=interactive)
\ No newline at end of file
@@ -8,58 +8,151 @@ Before running:
     $ caldbinit   # sets CALDB
 
 Usage examples
-    python run_nupipeline.py                 # jobs = auto (Ncpu//2)
+    python run_nupipeline.py                 # jobs = auto (usable CPUs//2)
     python run_nupipeline.py -j 4            # 4 workers
 """
 
 from __future__ import annotations
 import argparse
-import json
 import logging
+import mmap
 import multiprocessing as mp
 import os
 import pathlib
-import re
-import shutil
+import signal
 import subprocess
 import sys
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from tqdm.auto import tqdm
 
+from worker_pool import (cpu_queue, kill_process_group, pin_worker, queue_logging,
+                         raise_interrupt, stop_pool, usable_cpus)
+
+
+# ------------------------------------------------------------------
+# helper: JSON config and checkpoint files
+# ------------------------------------------------------------------
+try:
+    import orjson                     # faster, but optional
+except ImportError:
+    import json
+
+    def _load_json(data: bytes):
+        return json.loads(data)
+
+    def _dump_json(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode()
+else:
+    def _load_json(data: bytes):
+        return orjson.loads(data)
+
+    def _dump_json(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
 
 # ------------------------------------------------------------------
 # helper: does this OBSID need a (re)run?
 # ------------------------------------------------------------------
-_FINISH_RE = re.compile(r"Finished nupipeline for (\d+)")
+_FINISH_MARKER = b"Finished nupipeline for "
 
 
 def _needs_rerun(obsid: str, cfg: dict) -> bool:
     """
     Return True if the observation should be (re)processed:
 
-        • log file missing
+        • log file missing or empty
+        • or log file older than cfg["pipeline_version_mtime"] (a Unix
+          time, optional), e.g. written by an older HEASoft install
         • or log file does NOT contain the finished marker
     """
     log_path = pathlib.Path(cfg["outdir_base"]) / f"{obsid}_out" / "nupipeline.log"
-    if not log_path.is_file():
-        return True
+    try:
+        # one open() answers "does it exist"
+        fd = os.open(log_path, os.O_RDONLY)
+    except OSError:
+        return True                   # missing or unreadable log
 
     try:
-        # read just the last ~100 lines to search for the marker
-        tail = log_path.read_text(errors="ignore").splitlines()[-100:]
-        for line in reversed(tail):
-            m = _FINISH_RE.search(line)
-            if m and m.group(1) == obsid:
+        # search the mapped log backwards: a finished log has the marker in
+        # its last line, and any other is scanned in C without a heap copy
+        st = os.fstat(fd)
+        if st.st_size == 0:
+            return True               # empty (and cannot be mapped)
+        if st.st_mtime < cfg.get("pipeline_version_mtime", 0):
+            return True               # stale: no need to read it
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            # the newline stops OBSID 123 from matching a log for 1234
+            if mm.rfind(_FINISH_MARKER + obsid.encode() + b"\n") != -1:
                 return False          # completed earlier
-    except OSError:
+    except (OSError, ValueError):
         pass                          # unreadable log → treat as failed
+    finally:
+        os.close(fd)
     return True
 
 
+# ------------------------------------------------------------------
+# helper: checkpoint of finished OBSIDs
+# ------------------------------------------------------------------
+_CHECKPOINT_NAME = "checkpoint.json"
+
+
+def _load_checkpoint(path: pathlib.Path, stale_before: float = 0) -> set[str]:
+    """
+    Return the OBSIDs recorded as finished (empty if no usable checkpoint).
+
+    The checkpoint remembers the pipeline_version_mtime it was written
+    under; if that has changed, it is ignored so every log gets re-checked
+    against the new threshold.
+    """
+    try:
+        ckpt = _load_json(path.read_bytes())
+        if ckpt["pipeline_version_mtime"] != stale_before:
+            return set()
+        return set(ckpt["done"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return set()
+
+
+def _save_checkpoint(path: pathlib.Path, done: set[str],
+                     stale_before: float = 0) -> None:
+    """Atomically rewrite the checkpoint (temp file + rename)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    ckpt = {"pipeline_version_mtime": stale_before, "done": sorted(done)}
+    tmp.write_bytes(_dump_json(ckpt))
+    os.replace(tmp, path)
+
+
 # ------------------------------------------------------------------
 # worker wrapper
 # ------------------------------------------------------------------
+_CURRENT_PROC: subprocess.Popen | None = None   # job running in this worker
+
+
+def _init_worker(cpus_left) -> None:
+    """
+    Pool initializer: pin to a CPU (if given one), stop OpenMP
+    oversubscription, and kill the running job when the worker is stopped.
+    """
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    pin_worker(cpus_left)
+    signal.signal(signal.SIGTERM, _stop_current_job)
+    signal.signal(signal.SIGINT, _stop_current_job)
+
+
+def _stop_current_job(signum, frame) -> None:
+    """
+    Worker signal handler: terminate the running nupipe_one.sh and its
+    HEASoft children (SIGKILL after 5 s), then exit the worker.
+    """
+    proc = _CURRENT_PROC
+    if proc is not None:
+        kill_process_group(proc.pid)
+    os._exit(128 + signum)
+
+
 def _launch_one(args):
     """Run nupipe_one.sh for a single OBSID and return (obsid, exit‑code)."""
     obsid, cfg = args
@@ -71,7 +164,14 @@ def _launch_one(args):
         cfg.get("clobber", "no"),
         cfg.get("extra_args", ""),
     ]
-    return obsid, subprocess.call(cmd)
+    # own session/process group, so a stop signal reaches nupipeline itself
+    # and not just the bash wrapper waiting on it
+    global _CURRENT_PROC
+    _CURRENT_PROC = subprocess.Popen(cmd, start_new_session=True)
+    try:
+        return obsid, _CURRENT_PROC.wait()
+    finally:
+        _CURRENT_PROC = None
 
 
 # ------------------------------------------------------------------
@@ -93,14 +193,15 @@ def main(cfg_path: str, job_setting: str | int = "auto") -> None:
     cfg_file = pathlib.Path(cfg_path)
     if not cfg_file.exists():
         sys.exit(f"Config file '{cfg_file}' not found.")
-    cfg = json.loads(cfg_file.read_text())
+    cfg = _load_json(cfg_file.read_bytes())
     obsids: list[str] = cfg["observations"]
 
     # --------------------------------------------------------------
     # worker pool size
     # --------------------------------------------------------------
     if job_setting == "auto":
-        max_workers = max(1, mp.cpu_count() // 2)
+        # long, memory-heavy jobs: half the CPUs we may actually run on
+        max_workers = max(1, usable_cpus() // 2)
     elif job_setting == "off":
         max_workers = 1
     else:
@@ -109,10 +210,13 @@ def main(cfg_path: str, job_setting: str | int = "auto") -> None:
     # --------------------------------------------------------------
     # logging setup
     # --------------------------------------------------------------
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-    )
+    # plain stderr handler for now; it moves behind a queue once the
+    # workers have forked (see worker_pool.queue_logging)
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(stream)
     logging.info(
         "Request: %d OBSIDs   •   %d worker process(es)", len(obsids), max_workers
     )
@@ -120,16 +224,42 @@ def main(cfg_path: str, job_setting: str | int = "auto") -> None:
     # --------------------------------------------------------------
     # decide which OBSIDs to queue
     # --------------------------------------------------------------
+    # OBSIDs in the checkpoint are skipped without touching their logs
+    # (a checkpoint from an older pipeline_version_mtime is discarded)
+    ckpt_path = pathlib.Path(cfg["outdir_base"]) / _CHECKPOINT_NAME
+    stale_before = cfg.get("pipeline_version_mtime", 0)
+    done = _load_checkpoint(ckpt_path, stale_before)
+    n_done = len(done)
+
+    def _prepare(obs: str) -> bool:
+        if obs in done or not _needs_rerun(obs, cfg):
+            return False
+        outdir = pathlib.Path(cfg["outdir_base"]) / f"{obs}_out"
+        if outdir.is_dir():
+            # wipe partial run: one rename frees the path at once, the slow
+            # file-by-file delete runs in a separate `rm -rf` process (a
+            # thread would still be running when the worker pool forks, and
+            # rm finishes the job even if this script exits first)
+            trash = outdir.with_name(f"{outdir.name}.trash.{os.urandom(4).hex()}")
+            os.replace(outdir, trash)
+            subprocess.Popen(["rm", "-rf", "--", str(trash)],
+                             start_new_session=True)
+        return True
+
+    # the scan is pure stat/read/unlink I/O, so run it in threads
+    with ThreadPoolExecutor(max_workers=32) as tpool:
+        flags = list(tpool.map(_prepare, obsids))
+
     worklist: list[str] = []
-    for obs in obsids:
-        if _needs_rerun(obs, cfg):
-            outdir = pathlib.Path(cfg["outdir_base"]) / f"{obs}_out"
-            if outdir.is_dir():
-                shutil.rmtree(outdir)          # wipe partial run
+    for obs, rerun in zip(obsids, flags):
+        if rerun:
             worklist.append(obs)
             logging.info("↺  queued   %s", obs)
         else:
+            done.add(obs)
             logging.info("✓  skipped  %s  (already finished)", obs)
+    if len(done) != n_done:
+        _save_checkpoint(ckpt_path, done, stale_before)
 
     if not worklist:
         logging.info("Nothing to do – all OBSIDs already finished.")
@@ -138,22 +268,53 @@ def main(cfg_path: str, job_setting: str | int = "auto") -> None:
     # --------------------------------------------------------------
     # parallel dispatch
     # --------------------------------------------------------------
-    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+    # fork workers explicitly: they inherit this process's imports and
+    # config instead of re-importing the script (spawn is the default on
+    # macOS and from Python 3.14)
+    ctx = mp.get_context("fork")
+    # no point forking workers that would never get an OBSID
+    max_workers = min(max_workers, len(worklist))
+
+    # pin each worker (and its HEASoft children) to its own logical CPU,
+    # spreading over physical cores before doubling up on their siblings,
+    # unless there are more workers than usable CPUs
+    cpus_left = cpu_queue(ctx, max_workers)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(cpus_left,),
+    ) as pool:
+        # one future per OBSID (i.e. chunksize 1): each job runs for hours,
+        # so batching would only hurt load balance
         futures = {
             pool.submit(_launch_one, (obs, cfg)): obs for obs in worklist
         }
-        for fut in tqdm(
-            as_completed(futures),
-            total=len(futures),
-            desc="nupipeline jobs",
-            unit="obs",
-        ):
-            obs = futures[fut]
-            rc = fut.result()[1]
-            if rc:
-                logging.error("OBSID %s exited with code %d", obs, rc)
-            else:
-                logging.info("OBSID %s finished OK", obs)
+        # the fork context starts every worker on the first submit, so the
+        # listener thread can start now
+        queue_logging(stream)
+        # treat SIGTERM (e.g. from a batch scheduler) like Ctrl-C
+        signal.signal(signal.SIGTERM, raise_interrupt)
+        try:
+            for fut in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                desc="nupipeline jobs",
+                unit="obs",
+            ):
+                obs = futures[fut]
+                rc = fut.result()[1]
+                if rc:
+                    logging.error("OBSID %s exited with code %d", obs, rc)
+                else:
+                    logging.info("OBSID %s finished OK", obs)
+                    done.add(obs)
+                    _save_checkpoint(ckpt_path, done, stale_before)
+        except KeyboardInterrupt:
+            logging.error("Interrupted – stopping workers and their nupipeline jobs")
+            stop_pool(pool)
+            sys.exit(130)
 
 
 # ------------------------------------------------------------------
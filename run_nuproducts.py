@@ -7,47 +7,150 @@ region_cfg.json, separately for FPMA (A) and FPMB (B).  Resumes safely.
 """
 from __future__ import annotations
 import argparse
-import json
 import logging
+import mmap
 import multiprocessing as mp
 import os
 import pathlib
-import re
-import subprocess
+import signal
 import sys
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from itertools import product
 from tqdm.auto import tqdm
+from worker_pool import (cpu_queue, kill_process_group, pin_worker, queue_logging,
+                         raise_interrupt, stop_pool, usable_cpus)
 
-# Regex to detect completion in log
-FIN_RE = re.compile(r"^nuproducts done", re.M)
+# orjson is faster but optional; json reads the same files and writes the
+# same indented checkpoint
+try:
+    import orjson
+except ImportError:
+    import json
 
-def _needs_rerun(outdir: pathlib.Path) -> bool:
-    log = outdir / "nuproducts.log"
-    return not (log.exists() and FIN_RE.search(log.read_text(errors="ignore")))
+    def _load_json(data: bytes):
+        return json.loads(data)
+
+    def _dump_json(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode()
+else:
+    def _load_json(data: bytes):
+        return orjson.loads(data)
+
+    def _dump_json(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+# Line that _launch appends to the log on completion
+FIN_MARKER = b"\nnuproducts done"
+# Completed jobs, recorded under products_base so a resume needs no per-job probe
+CHECKPOINT_NAME = "checkpoint.json"
+CHECKPOINT_EVERY = 50
+
+def _product_key(obsid: str, det: str, comb: tuple) -> str:
+    # "<obsid>/<det>_srcNNN_bkgNNN-NNN_bin<size>": the job's output dir
+    # under products_base, and its checkpoint key
+    r_src, rin, rout, binsize = comb
+    return f"{obsid}/{det}_src{r_src:03d}_bkg{rin:03d}-{rout:03d}_bin{binsize}"
+
+def _scan_completed(products_base: pathlib.Path, obsids: list[str],
+                    done: set[str], stale_before: float = 0) -> set[str]:
+    # One scandir per OBSID dir lists every existing product dir; only those
+    # not already in the checkpoint get their log checked
+    found = set()
+    for obsid in obsids:
+        try:
+            entries = os.scandir(products_base / obsid)
+        except OSError:
+            # missing or unreadable: leave its jobs queued
+            continue
+        with entries:
+            for entry in entries:
+                key = f"{obsid}/{entry.name}"
+                if (key not in done and entry.is_dir()
+                        and not _needs_rerun(pathlib.Path(entry.path), stale_before)):
+                    found.add(key)
+    return found
+
+def _load_checkpoint(path: pathlib.Path, stale_before: float = 0) -> set[str]:
+    # A checkpoint written under a different pipeline_version_mtime is
+    # ignored, so every log is re-checked against the new threshold
+    try:
+        ckpt = _load_json(path.read_bytes())
+        if ckpt["pipeline_version_mtime"] != stale_before:
+            return set()
+        return set(ckpt["done"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return set()
+
+def _save_checkpoint(path: pathlib.Path, done: set[str],
+                     stale_before: float = 0) -> None:
+    # Write to a temp file and rename, so a crash never leaves it truncated
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    ckpt = {"pipeline_version_mtime": stale_before, "done": sorted(done)}
+    tmp.write_bytes(_dump_json(ckpt))
+    os.replace(tmp, path)
+
+def _needs_rerun(outdir: pathlib.Path, stale_before: float = 0) -> bool:
+    # A single open() doubles as the existence check; the log is then mapped
+    # and searched backwards, so a finished one matches at once and any
+    # other is scanned in C without a heap copy
+    try:
+        fd = os.open(outdir / "nuproducts.log", os.O_RDONLY)
+    except OSError:
+        return True
+    try:
+        # Empty logs (which cannot be mapped) and logs older than
+        # stale_before are rerun without reading them
+        st = os.fstat(fd)
+        if st.st_size == 0 or st.st_mtime < stale_before:
+            return True
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            return mm.rfind(FIN_MARKER) == -1
+    finally:
+        os.close(fd)
+
+# Merged config, set once per worker by _init_worker rather than pickled
+# into every task
+_WORKER_CFG: dict | None = None
+
+def _init_worker(cfg: dict, cpus_left) -> None:
+    # Keep the config, pin to a CPU (if given one) and keep HEASoft's
+    # OpenMP single-threaded
+    global _WORKER_CFG
+    _WORKER_CFG = cfg
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    pin_worker(cpus_left)
+    signal.signal(signal.SIGTERM, _stop_child)
+    signal.signal(signal.SIGINT, _stop_child)
+
+# nuproducts process group running in this worker, if any
+_CHILD_PID: int | None = None
+
+def _stop_child(signum, frame) -> None:
+    # Worker signal handler: take the running nuproducts (and whatever it
+    # spawned) down with us – SIGTERM, then SIGKILL after 5 s
+    pid = _CHILD_PID
+    if pid is not None:
+        kill_process_group(pid)
+    os._exit(128 + signum)
 
 def _launch(args):
-    obsid, det, cfg, comb = args
+    obsid, det, comb = args
+    cfg = _WORKER_CFG
     r_src, rin, rout, binsize = comb
 
-    # file setup
+    # file setup (plain strings: they only end up in argv, so building
+    # Path objects per task would be wasted work)
     stem   = f"nu{obsid}"
-    evtdir = pathlib.Path(cfg["outdir_base"]) / f"{obsid}_out"
-    src_reg = evtdir / f"src_{det}_{r_src:03.0f}.reg"
-    bkg_reg = evtdir / f"bkg_{det}_{rin:03.0f}-{rout:03.0f}.reg"
-
-    outdir = (
-        pathlib.Path(cfg["products_base"]) / obsid /
-        f"{det}_src{r_src:03d}_bkg{rin:03d}-{rout:03d}_bin{binsize}"
-    )
-    outdir.mkdir(parents=True, exist_ok=True)
+    evtdir = f"{cfg['outdir_base']}/{obsid}_out"
+    src_reg = f"{evtdir}/src_{det}_{r_src:03.0f}.reg"
+    bkg_reg = f"{evtdir}/bkg_{det}_{rin:03.0f}-{rout:03.0f}.reg"
 
-    # skip if already done
-    if not _needs_rerun(outdir):
-        return obsid, det, comb, 0
+    outdir = f"{cfg['products_base']}/{_product_key(obsid, det, comb)}"
+    os.makedirs(outdir, exist_ok=True)
 
     # run nuproducts
-    log = outdir / "nuproducts.log"
+    log = f"{outdir}/nuproducts.log"
     cmd = [
         "nuproducts",
         f"indir={evtdir}",
@@ -62,19 +165,50 @@ def _launch(args):
         f"binsize={binsize}",
         "clobber=yes",
     ]
-    rc = subprocess.call(cmd, stdout=open(log, "w"), stderr=subprocess.STDOUT)
+    # posix_spawn skips fork()'s page-table copy of this worker; the child
+    # gets the log as stdout and stderr, and its own session so _stop_child
+    # can signal the whole group
+    global _CHILD_PID
+    fd = os.open(log, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _CHILD_PID = os.posix_spawnp(cmd[0], cmd, os.environ, setsid=True,
+                                     file_actions=[
+            (os.POSIX_SPAWN_DUP2, fd, 1),
+            (os.POSIX_SPAWN_DUP2, fd, 2),
+            (os.POSIX_SPAWN_CLOSE, fd),
+        ])
+        rc = os.waitstatus_to_exitcode(os.waitpid(_CHILD_PID, 0)[1])
 
-    # mark completion
-    if rc == 0:
-        with open(log, "a") as fp:
-            fp.write("\nnuproducts done\n")
+        # mark completion (the shared offset is already past the child's output)
+        if rc == 0:
+            os.write(fd, FIN_MARKER + b"\n")
+    finally:
+        # never leave a stale pid for _stop_child to signal
+        _CHILD_PID = None
+        os.close(fd)
 
     return obsid, det, comb, rc
 
+def _launch_guarded(args):
+    # One failing task must not take its whole chunk down, so report the
+    # exception as a result instead
+    try:
+        return (*_launch(args), None)
+    except Exception as e:
+        return (*args, "exception", str(e))
+
+def _launch_chunk(chunk):
+    return [_launch_guarded(args) for args in chunk]
+
+def _iter_unordered(futures):
+    # Results of each chunk as soon as it finishes, whatever its position
+    for fut in as_completed(futures):
+        yield from fut.result()
+
 def main() -> None:
     # load configs
-    rcfg = json.loads(pathlib.Path("region_cfg.json").read_text())
-    ocfg = json.loads(pathlib.Path("obslist.json").read_text())
+    rcfg = _load_json(pathlib.Path("region_cfg.json").read_bytes())
+    ocfg = _load_json(pathlib.Path("obslist.json").read_bytes())
 
     # ensure HEASoft is initialized
     if "HEADAS" not in os.environ or "CALDB" not in os.environ:
@@ -87,45 +221,102 @@ def main() -> None:
         for rin, rout in rcfg["bkg_annuli_arcsec"]
         for binsize in rcfg["bin_sizes_s"]
     ]
+    cfg = {**ocfg, **rcfg}
+    ckpt_path = pathlib.Path(cfg["products_base"]) / CHECKPOINT_NAME
+    stale_before = cfg.get("pipeline_version_mtime", 0)
+    done = _load_checkpoint(ckpt_path, stale_before)
+    # finished jobs that the checkpoint does not know about yet (e.g. older runs)
+    found = _scan_completed(pathlib.Path(cfg["products_base"]), ocfg["observations"],
+                            done, stale_before)
+    if found:
+        done |= found
+        _save_checkpoint(ckpt_path, done, stale_before)
     tasks = [
-        (obs, det, {**ocfg, **rcfg}, comb)
+        (obs, det, comb)
         for obs in ocfg["observations"]
         for det in ("A", "B")
         for comb in combos
+        if _product_key(obs, det, comb) not in done
     ]
+    # Longest jobs first (the smallest bins write the most rows), so the
+    # short ones fill idle workers at the end of the batch
+    tasks.sort(key=lambda t: t[2][3])
 
-    # logging setup
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s"
-    )
-    max_workers = max(1, mp.cpu_count() // 2)
-    logging.info("Queued %d nuproducts jobs using %d workers", len(tasks), max_workers)
+    # logging setup: plain stderr until the workers have forked, then
+    # behind a queue (see worker_pool.queue_logging)
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(stream)
+    # Jobs are short, so use every CPU we are allowed on (affinity honours
+    # taskset/cgroup/Slurm masks, unlike cpu_count), but not more than tasks
+    max_workers = max(1, min(usable_cpus(), len(tasks)))
+    logging.info("Queued %d nuproducts jobs using %d workers (%d already in %s)",
+                 len(tasks), max_workers, len(done), ckpt_path)
 
     # run in parallel, collect failures
     failures: list[tuple[str, str, tuple, int | str]] = []
-    with ProcessPoolExecutor(max_workers=max_workers) as pool:
-        futs = { pool.submit(_launch, t): t for t in tasks }
-        for fut in tqdm(as_completed(futs), total=len(futs), unit="job"):
-            obsid, det, comb = futs[fut][:3]
-            try:
-                oid, detd, combd, rc = fut.result()
-            except Exception as e:
-                logging.error("%s %s %s raised exception: %s", obsid, det, comb, e)
-                failures.append((obsid, det, comb, "exception"))
-            else:
-                r_src, rin, rout, binsize = combd
-                if rc != 0:
-                    logging.error(
-                        "%s %s src%s bkg%s-%s bin%s failed (exit %s)",
-                        oid, detd, r_src, rin, rout, binsize, rc
-                    )
-                    failures.append((oid, detd, combd, rc))
+    n_new = 0
+    # Fork workers explicitly so they inherit the imports and config rather
+    # than re-importing this script (spawn is the default on macOS and 3.14+)
+    ctx = mp.get_context("fork")
+    # pin each worker to its own logical CPU, filling the physical cores
+    # before their hyper-thread siblings
+    cpus_left = cpu_queue(ctx, max_workers)
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                             initializer=_init_worker,
+                             initargs=(cfg, cpus_left)) as pool:
+        # Each worker takes tasks in chunks, which amortises the pickle/pipe
+        # round-trip over several nuproducts runs. Chunks are collected in
+        # completion order, so one slow chunk doesn't hold back the progress
+        # bar, logging and checkpoints of the ones finishing after it.
+        # Chunks are dealt round-robin from the longest-first list, so each
+        # gets a mix of long and short jobs instead of the first chunks
+        # holding all the long ones
+        chunksize = max(1, len(tasks) // (max_workers * 4))
+        n_chunks = -(-len(tasks) // chunksize)
+        futures = [pool.submit(_launch_chunk, tasks[k::n_chunks])
+                   for k in range(n_chunks)]
+        # The fork context starts every worker on the first submit, so the
+        # listener thread can start now
+        queue_logging(stream)
+        # Throttle progress-bar redraws; with thousands of quick jobs the
+        # per-update refresh shows up in the main process
+        progress = tqdm(_iter_unordered(futures), total=len(tasks), unit="job", mininterval=1.0,
+                        miniters=max(1, len(tasks) // 200), dynamic_ncols=False)
+        # Treat SIGTERM (e.g. from a batch scheduler) like Ctrl-C
+        signal.signal(signal.SIGTERM, raise_interrupt)
+        try:
+            for oid, detd, combd, rc, err in progress:
+                if err is not None:
+                    logging.error("%s %s %s raised exception: %s", oid, detd, combd, err)
+                    failures.append((oid, detd, combd, "exception"))
                 else:
-                    logging.info(
-                        "%s %s src%s bkg%s-%s bin%s completed",
-                        oid, detd, r_src, rin, rout, binsize
-                    )
+                    r_src, rin, rout, binsize = combd
+                    if rc != 0:
+                        logging.error(
+                            "%s %s src%s bkg%s-%s bin%s failed (exit %s)",
+                            oid, detd, r_src, rin, rout, binsize, rc
+                        )
+                        failures.append((oid, detd, combd, rc))
+                    else:
+                        logging.info(
+                            "%s %s src%s bkg%s-%s bin%s completed",
+                            oid, detd, r_src, rin, rout, binsize
+                        )
+                        done.add(_product_key(oid, detd, combd))
+                        n_new += 1
+                        if n_new % CHECKPOINT_EVERY == 0:
+                            _save_checkpoint(ckpt_path, done, stale_before)
+        except KeyboardInterrupt:
+            logging.error("Interrupted – stopping workers and their nuproducts runs")
+            stop_pool(pool)
+            _save_checkpoint(ckpt_path, done, stale_before)
+            sys.exit(130)
+    if n_new:
+        _save_checkpoint(ckpt_path, done, stale_before)
 
     # final exit status
     if failures:
@@ -0,0 +1,176 @@
+"""
+worker_pool.py  –  process-pool helpers shared by the batch drivers
+
+Used by run_nupipeline.py and run_nuproducts.py for CPU pinning, NUMA
+memory placement, queued logging and stopping workers with their HEASoft
+jobs.
+"""
+
+from __future__ import annotations
+import atexit
+import ctypes
+import ctypes.util
+import logging
+import logging.handlers
+import multiprocessing as mp
+import os
+import queue
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ------------------------------------------------------------------
+# CPU pinning and NUMA placement
+# ------------------------------------------------------------------
+def usable_cpus() -> int:
+    """
+    Number of CPUs this process may run on. Unlike cpu_count(), this
+    honours taskset/cgroup/Slurm affinity masks on shared nodes.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def cpus_by_core() -> list[int]:
+    """
+    Return the usable logical CPUs, one per physical core first and the
+    hyper-thread siblings after them, so that workers only share a core
+    once every core has one.
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return []                     # no affinity API (e.g. macOS)
+    cores: list[int] = []
+    siblings_of_cores: list[int] = []
+    seen: set[str] = set()
+    for cpu in sorted(os.sched_getaffinity(0)):
+        topo = f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        try:
+            with open(topo) as fp:
+                siblings = fp.read().strip()
+        except OSError:
+            siblings = str(cpu)       # unknown topology → own core
+        if siblings not in seen:
+            seen.add(siblings)
+            cores.append(cpu)
+        else:
+            siblings_of_cores.append(cpu)
+    return cores + siblings_of_cores
+
+
+def numa_node(cpu: int) -> int | None:
+    """NUMA node of a logical CPU (falls back to its socket id)."""
+    cpudir = f"/sys/devices/system/cpu/cpu{cpu}"
+    try:
+        for name in os.listdir(cpudir):
+            if name.startswith("node") and name[4:].isdigit():
+                return int(name[4:])
+        with open(f"{cpudir}/topology/physical_package_id") as fp:
+            return int(fp.read())
+    except (OSError, ValueError):
+        return None
+
+
+def prefer_local_memory(cpu: int) -> None:
+    """
+    Ask the kernel to allocate this process's memory on the NUMA node of
+    `cpu`. The policy is inherited across fork/exec/posix_spawn, so the
+    HEASoft tools' buffers stay on the local socket too. No-op without
+    libnuma.
+    """
+    node = numa_node(cpu)
+    libname = ctypes.util.find_library("numa")
+    if node is None or libname is None:
+        return
+    libnuma = ctypes.CDLL(libname)
+    if libnuma.numa_available() < 0:
+        return                        # kernel without NUMA support
+    libnuma.numa_set_preferred(node)
+
+
+def cpu_queue(ctx, n_workers: int):
+    """
+    Return a queue holding one logical CPU per worker (physical cores
+    first), or None if there are more workers than usable CPUs. Each
+    worker takes its CPU with pin_worker() from the pool initializer.
+    """
+    cpus = cpus_by_core()
+    if len(cpus) < n_workers:
+        return None
+    # SimpleQueue writes straight to its pipe; Queue would start a feeder
+    # thread here, just before the pool forks
+    cpus_left = ctx.SimpleQueue()
+    for cpu in cpus[:n_workers]:
+        cpus_left.put(cpu)
+    return cpus_left
+
+
+def pin_worker(cpus_left) -> None:
+    """Pin the calling worker to the next CPU from cpu_queue(), if any."""
+    if cpus_left is None:
+        return
+    cpu = cpus_left.get()
+    os.sched_setaffinity(0, {cpu})
+    prefer_local_memory(cpu)
+
+
+# ------------------------------------------------------------------
+# stopping workers and their jobs
+# ------------------------------------------------------------------
+def kill_process_group(pid: int, grace: float = 5) -> None:
+    """
+    SIGTERM the process group led by child `pid`, then SIGKILL it if the
+    child has not exited after `grace` seconds.
+
+    Reaps with waitpid directly: when called from a signal handler, an
+    interrupted Popen.wait() still holds Popen's wait lock, so poll() and
+    wait() would see nothing and always run into the timeout.
+    """
+    try:
+        os.killpg(pid, signal.SIGTERM)
+        deadline = time.monotonic() + grace
+        while os.waitpid(pid, os.WNOHANG)[0] == 0:
+            if time.monotonic() > deadline:
+                os.killpg(pid, signal.SIGKILL)
+                break
+            time.sleep(0.1)
+    except (ProcessLookupError, ChildProcessError):
+        pass                          # already gone
+
+
+def raise_interrupt(signum, frame) -> None:
+    """SIGTERM handler for the main process: treat it like Ctrl-C."""
+    raise KeyboardInterrupt
+
+
+def stop_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    SIGTERM every worker, whose own handler then kills its running job,
+    and drop the work still queued.
+    """
+    # the pool's workers are this process's multiprocessing children
+    for proc in mp.active_children():
+        proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------------------------------------------------------
+# logging
+# ------------------------------------------------------------------
+def queue_logging(stream: logging.Handler) -> None:
+    """
+    Move `stream` behind a queue: the main thread only enqueues records and
+    a listener thread does the (locked, synchronous) writes, so logging
+    never holds up the collection of finished jobs.
+
+    Call only once the worker pool has forked – a child forked while the
+    listener runs could inherit a lock the listener holds.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    root = logging.getLogger()
+    root.removeHandler(stream)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)    # flushes what is still queued